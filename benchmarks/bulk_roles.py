@@ -0,0 +1,74 @@
+"""
+Micro-benchmark: desired-role evaluation for every wallet, per-wallet TierTable.roles_for()
+vs the vectorized TierTable.bulk_roles() (needs NumPy).
+
+Usage:
+    python -m benchmarks.bulk_roles [--wallets 100000] [--collections 50] [--tiers 3] [--held 4] [--repeat 5]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from src import role_engine
+from src.role_engine import TierTable
+
+
+def _tier_table(collections: int, tiers: int, rng: random.Random) -> TierTable:
+    rows = []
+    tier_id = 1
+    for c in range(collections):
+        for threshold in sorted(rng.sample(range(1, 30), tiers)):
+            rows.append((tier_id, f"collection{c}", threshold, 10 ** 17 + tier_id))
+            tier_id += 1
+    return TierTable.compile(rows)
+
+
+def _holdings(wallets: int, collections: int, held: int, rng: random.Random) -> dict:
+    # Each wallet holds 0..2*held collections, most of them with small counts.
+    return {
+        f"wallet{w}": {
+            f"collection{rng.randrange(collections)}": int(rng.expovariate(0.2)) + 1
+            for _ in range(rng.randrange(2 * held + 1))
+        }
+        for w in range(wallets)
+    }
+
+
+def _measure(label: str, repeat: int, fn):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    print(f"{label:<20} best={min(samples) * 1000:8.1f}ms  median={statistics.median(samples) * 1000:8.1f}ms")
+    return result
+
+
+def main(args):
+    rng = random.Random(7)
+    tier_table = _tier_table(args.collections, args.tiers, rng)
+    holdings = _holdings(args.wallets, args.collections, args.held, rng)
+    print(f"wallets={args.wallets} collections={args.collections} tiers/collection={args.tiers}")
+
+    per_wallet = _measure(
+        "per-wallet", args.repeat,
+        lambda: {wallet: frozenset(tier_table.roles_for(colls)[0]) for wallet, colls in holdings.items()}
+    )
+    if role_engine._numpy() is None:
+        print("NumPy is not installed; bulk_roles() falls back to the per-wallet path.")
+        return
+
+    bulk = _measure("bulk (numpy)", args.repeat, lambda: tier_table.bulk_roles(holdings))
+    print(f"results match: {bulk == per_wallet}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wallets", type=int, default=100_000)
+    parser.add_argument("--collections", type=int, default=50)
+    parser.add_argument("--tiers", type=int, default=3)
+    parser.add_argument("--held", type=int, default=4, help="average collections held per wallet")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark: per-call latency of Database reads/writes, per-call connections vs the pooled layer.
+
+Usage:
+    python -m benchmarks.db_latency [--calls 2000] [--users 10000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import aiosqlite
+
+from src.db import Database
+
+
+async def _seed(db: Database, users: int):
+    await db.init_db()
+    async with db._transaction() as conn:
+        await conn.executemany(
+            "INSERT OR REPLACE INTO users (discord_id, wallet_address, verified_at, last_checked) VALUES (?, ?, ?, ?)",
+            [(i, f"wallet{i}", time.time(), time.time()) for i in range(users)]
+        )
+
+
+async def _per_call_get_user(db_path: str, discord_id: int):
+    # The pre-pool implementation: a fresh connection for every call.
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT * FROM users WHERE discord_id = ?", (discord_id,)) as cursor:
+            return await cursor.fetchone()
+
+
+async def _per_call_add_user(db_path: str, discord_id: int, wallet: str):
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO users (discord_id, wallet_address, verified_at, last_checked) VALUES (?, ?, ?, ?)",
+            (discord_id, wallet, time.time(), time.time())
+        )
+        await db.commit()
+
+
+async def _measure(label: str, calls: int, fn):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await fn(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{label:<28} mean={statistics.fmean(samples):8.1f}us  p50={p50:8.1f}us  p99={p99:8.1f}us")
+
+
+async def main(calls: int, users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database()
+        db.db_path = os.path.join(tmp, "bench.db")
+        await db.connect()
+        await _seed(db, users)
+
+        await _measure("get_user  (per-call conn)", calls, lambda i: _per_call_get_user(db.db_path, i % users))
+        await _measure("get_user  (pooled)", calls, lambda i: db.get_user(i % users))
+        await _measure("add_user  (per-call conn)", calls, lambda i: _per_call_add_user(db.db_path, users + i, f"a{i}"))
+        await _measure("add_user  (pooled)", calls, lambda i: db.add_user(users * 2 + i, f"b{i}"))
+        await _measure("get_tiers (pooled)", calls, lambda i: db.get_tiers("collection"))
+
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.users))
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark: event-loop stall while decoding large DAS pages, comparing the old path
+(stdlib json.loads of whole assets on the loop) with orjson + projection inline, in a thread
+and in a worker process (HeliusClient's HELIUS_DECODE_PROCESSES).
+
+A ticker coroutine sleeps 1ms in a loop; any extra delay is time the loop was blocked.
+
+Usage:
+    python -m benchmarks.decode [--pages 20] [--assets 1000]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from src import helius_client
+from src.helius_client import decode_response
+
+
+def _asset(i: int) -> dict:
+    # Shaped like a Helius getAssetsByGroup item, metadata included.
+    return {
+        "interface": "V1_NFT",
+        "id": f"Asset{i:040d}",
+        "content": {
+            "$schema": "https://schema.metaplex.com/nft1.0.json",
+            "json_uri": f"https://arweave.net/{i:043d}",
+            "files": [{"uri": f"https://arweave.net/{i:043d}?ext=png", "cdn_uri": f"https://cdn.helius-rpc.com/cdn-cgi/image//https://arweave.net/{i:043d}?ext=png", "mime": "image/png"}],
+            "metadata": {
+                "attributes": [{"value": f"value-{i % 17}-{k}", "trait_type": f"trait-{k}"} for k in range(8)],
+                "description": "A benchmark asset with a description about as long as a real one tends to be.",
+                "name": f"Bench #{i}",
+                "symbol": "BENCH",
+            },
+            "links": {"image": f"https://arweave.net/{i:043d}?ext=png", "external_url": "https://example.com"},
+        },
+        "authorities": [{"address": "Authority1111111111111111111111111111111111", "scopes": ["full"]}],
+        "compression": {"eligible": False, "compressed": False, "data_hash": "", "creator_hash": "", "asset_hash": "", "tree": "", "seq": 0, "leaf_id": 0},
+        "grouping": [{"group_key": "collection", "group_value": "BenchCollection0000"}],
+        "royalty": {"royalty_model": "creators", "target": None, "percent": 0.05, "basis_points": 500, "primary_sale_happened": True, "locked": False},
+        "creators": [{"address": "Creator11111111111111111111111111111111111", "share": 100, "verified": True}],
+        "ownership": {"frozen": False, "delegated": False, "delegate": None, "ownership_model": "single", "owner": f"BenchWallet{i % 5000:07d}"},
+        "supply": {"print_max_supply": 0, "print_current_supply": 0, "edition_nonce": 254},
+        "mutable": True,
+        "burnt": False,
+    }
+
+
+def _page(assets: int) -> bytes:
+    items = [_asset(i) for i in range(assets)]
+    body = {"jsonrpc": "2.0", "id": 1, "result": {"total": assets, "limit": assets, "page": 1, "items": items}}
+    return json.dumps(body).encode()
+
+
+def _stdlib_full(raw: bytes):
+    return json.loads(raw)
+
+
+async def _measure(label: str, pages: list, decode):
+    loop = asyncio.get_running_loop()
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            start = loop.time()
+            await asyncio.sleep(0.001)
+            lags.append(max(0.0, loop.time() - start - 0.001))
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    lags.clear()
+    start = time.perf_counter()
+    for raw in pages:
+        await decode(raw)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    print(
+        f"{label:<28} total={elapsed * 1000:8.1f}ms  max_stall={max(lags, default=0) * 1000:7.1f}ms  "
+        f"p99_stall={p99 * 1000:6.1f}ms  blocked={sum(lags) * 1000:8.1f}ms"
+    )
+
+
+async def main(args):
+    pages = [_page(args.assets) for _ in range(args.pages)]
+    print(f"{args.pages} pages x {args.assets} assets, {statistics.mean(map(len, pages)) / 1024:.0f} KiB per page, orjson={'yes' if helius_client.orjson else 'no'}")
+    loop = asyncio.get_running_loop()
+
+    async def inline_stdlib(raw):
+        return _stdlib_full(raw)
+
+    async def inline_projected(raw):
+        return decode_response(raw)
+
+    threads = ThreadPoolExecutor(1)
+    processes = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+    # Warm the worker process up so its start-up is not counted.
+    await loop.run_in_executor(processes, decode_response, pages[0])
+
+    async def in_thread(raw):
+        return await loop.run_in_executor(threads, decode_response, raw)
+
+    async def in_process(raw):
+        return await loop.run_in_executor(processes, decode_response, raw)
+
+    await _measure("before: json.loads on loop", pages, inline_stdlib)
+    await _measure("orjson + projection inline", pages, inline_projected)
+    await _measure("orjson + projection, thread", pages, in_thread)
+    await _measure("orjson + projection, process", pages, in_process)
+    threads.shutdown()
+    processes.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--assets", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""
+Minimal stand-ins for the discord.py objects the sync path touches (guilds, members, roles),
+so RoleSyncer and RoleMutationScheduler can run without a gateway connection.
+
+Like the bot (chunk_guilds_at_startup=False), a guild starts with an empty member cache
+unless `chunked=True`; members enter it through query_members(), chunk() or when they are edited.
+"""
+import asyncio
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str, guild: "FakeGuild", default: bool = False):
+        self.id = role_id
+        self.name = name
+        self.guild = guild
+        self._default = default
+
+    def is_default(self) -> bool:
+        return self._default
+
+    @property
+    def members(self):
+        # Same semantics as discord.py: a scan of the guild's member cache.
+        return [member for member in self.guild._cache.values() if self in member.roles]
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMember:
+    def __init__(self, member_id: int, guild: "FakeGuild"):
+        self.id = member_id
+        self.guild = guild
+        self.roles = [guild.default_role]
+
+    async def edit(self, *, roles, reason=None):
+        if self.guild.edit_latency:
+            await asyncio.sleep(self.guild.edit_latency)
+        self.roles = [self.guild.default_role, *roles]
+        self.guild.edits += 1
+        # The resulting GUILD_MEMBER_UPDATE puts the member in the cache.
+        self.guild._cache[self.id] = self
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, edit_latency: float = 0.0, chunked: bool = False):
+        self.id = guild_id
+        self.edit_latency = edit_latency  # seconds per member.edit(), to mimic the REST round trip
+        self.chunked = chunked
+        self.edits = 0
+        self.member_queries = 0
+        self.default_role = FakeRole(guild_id, "@everyone", self, default=True)
+        self._roles = {guild_id: self.default_role}
+        self._members = {}  # everyone in the guild
+        self._cache = {}  # what the client has cached
+
+    @property
+    def members(self):
+        return list(self._cache.values())
+
+    def add_role(self, role_id: int, name: str) -> FakeRole:
+        role = self._roles[role_id] = FakeRole(role_id, name, self)
+        return role
+
+    def add_member(self, member_id: int) -> FakeMember:
+        member = self._members[member_id] = FakeMember(member_id, self)
+        if self.chunked:
+            self._cache[member_id] = member
+        return member
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id: int):
+        return self._cache.get(member_id)
+
+    async def query_members(self, query=None, *, limit=5, user_ids=None, presences=False, cache=True):
+        self.member_queries += 1
+        found = [self._members[i] for i in (user_ids or [])[:limit] if i in self._members]
+        if cache:
+            self._cache.update((member.id, member) for member in found)
+        return found
+
+    async def chunk(self, *, cache=True):
+        self.member_queries += 1
+        if cache:
+            self._cache.update(self._members)
+            self.chunked = True
+        return list(self._members.values())
+
+
+class FakeBot:
+    """
+    Carries what RoleSyncer expects from NFTVerificationBot.
+    """
+    def __init__(self, guilds, db, role_engine, role_scheduler):
+        self.guilds = guilds
+        self.db = db
+        self.role_engine = role_engine
+        self.role_scheduler = role_scheduler
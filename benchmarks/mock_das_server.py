@@ -0,0 +1,205 @@
+"""
+Local stand-in for the Helius DAS API, for benchmarking the sync path without touching production.
+
+Serves getAssetsByGroup (optionally sorted by recent_action), getAssetsByOwner and
+searchAssets (owner + collection grouping), single or batched. Ownership is generated from
+a seed, so two runs with the same settings see the same data. Admin endpoints:
+
+    GET  /stats                       request / call / error counters
+    POST /advance {"churn": 0.01}     moves that fraction of every collection to new owners
+                                      ("collections": N limits it to the first N collections)
+
+Usage:
+    python -m benchmarks.mock_das_server [--port 8765] [--collections 5] [--supply 1000]
+        [--wallets 5000] [--latency-ms 0] [--error-rate 0]
+"""
+import argparse
+import asyncio
+import heapq
+import random
+from dataclasses import asdict, dataclass
+
+from aiohttp import web
+
+
+def collection_address(index: int) -> str:
+    return f"BenchCollection{index:04d}"
+
+
+def wallet_address(index: int) -> str:
+    return f"BenchWallet{index:07d}"
+
+
+@dataclass
+class MockDASConfig:
+    collections: int = 5
+    supply: int = 1000  # assets per collection
+    wallets: int = 5000  # size of the owner universe
+    latency_ms: float = 0.0  # added to every HTTP request
+    error_rate: float = 0.0  # fraction of HTTP requests answered with 503
+    seed: int = 1
+
+
+class MockDAS:
+    def __init__(self, config: MockDASConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.addresses = [collection_address(c) for c in range(config.collections)]
+        # owners[c][i] = wallet index owning asset i of collection c
+        self.owners = [
+            [self.random.randrange(config.wallets) for _ in range(config.supply)]
+            for _ in range(config.collections)
+        ]
+        # last_action[c][i] = epoch of the last transfer of asset i, for sortBy recent_action
+        self.last_action = [[0] * config.supply for _ in range(config.collections)]
+        self._by_owner = None  # wallet index -> {collection index: [asset index]}, rebuilt lazily
+        self.http_requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.epoch = 0
+
+    def advance(self, churn: float, collections: int = None) -> int:
+        """
+        Transfers `churn` of each collection's supply (of the first `collections` only, if given)
+        to random wallets. Returns assets moved.
+        """
+        moved = 0
+        self.epoch += 1
+        per_collection = int(self.config.supply * churn)
+        for c, owners in enumerate(self.owners[:collections]):
+            for i in self.random.sample(range(len(owners)), min(per_collection, len(owners))):
+                owners[i] = self.random.randrange(self.config.wallets)
+                self.last_action[c][i] = self.epoch
+                moved += 1
+        self._by_owner = None
+        return moved
+
+    def _owner_index(self) -> dict:
+        if self._by_owner is None:
+            by_owner = {}
+            for c, owners in enumerate(self.owners):
+                for i, w in enumerate(owners):
+                    by_owner.setdefault(w, {}).setdefault(c, []).append(i)
+            self._by_owner = by_owner
+        return self._by_owner
+
+    def _asset(self, c: int, i: int) -> dict:
+        return {
+            "id": f"{self.addresses[c]}-{i}",
+            "interface": "V1_NFT",
+            "grouping": [{"group_key": "collection", "group_value": self.addresses[c]}],
+            "ownership": {"owner": wallet_address(self.owners[c][i]), "frozen": False},
+            "compression": {"compressed": False},
+        }
+
+    @staticmethod
+    def _page(items: list, params: dict) -> dict:
+        page, limit = int(params.get("page", 1)), int(params.get("limit", 1000))
+        chunk = items[(page - 1) * limit:page * limit]
+        return {"total": len(chunk), "limit": limit, "page": page, "items": chunk}
+
+    def _assets_of_owner(self, owner: str, collection: str = None) -> list:
+        if not owner.startswith("BenchWallet"):
+            return []
+        held = self._owner_index().get(int(owner[len("BenchWallet"):]), {})
+        assets = []
+        for c, indices in sorted(held.items()):
+            if collection is None or self.addresses[c] == collection:
+                assets.extend(self._asset(c, i) for i in indices)
+        return assets
+
+    def _dispatch(self, call: dict) -> dict:
+        self.calls += 1
+        method, params = call.get("method"), call.get("params") or {}
+
+        if method == "getAssetsByGroup":
+            collection = params.get("groupValue")
+            if collection not in self.addresses:
+                result = self._page([], params)
+            else:
+                c = self.addresses.index(collection)
+                page, limit = int(params.get("page", 1)), int(params.get("limit", 1000))
+                indices = range((page - 1) * limit, min(page * limit, self.config.supply))
+                if (params.get("sortBy") or {}).get("sortBy") == "recent_action":
+                    # Newest action first; ties in asset order. Only used for small probe pages.
+                    actions = self.last_action[c]
+                    ordered = heapq.nsmallest(page * limit, range(self.config.supply), key=lambda i: (-actions[i], i))
+                    indices = ordered[(page - 1) * limit:]
+                items = [self._asset(c, i) for i in indices]
+                result = {"total": len(items), "limit": limit, "page": page, "items": items}
+        elif method == "getAssetsByOwner":
+            result = self._page(self._assets_of_owner(params.get("ownerAddress", "")), params)
+        elif method == "searchAssets":
+            grouping = params.get("grouping") or [None, None]
+            result = self._page(self._assets_of_owner(params.get("ownerAddress", ""), grouping[1]), params)
+        else:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+        if self.config.error_rate and self.random.random() < self.config.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="mock upstream error")
+
+        body = await request.json()
+        if isinstance(body, list):
+            return web.json_response([self._dispatch(call) for call in body])
+        return web.json_response(self._dispatch(body))
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "http_requests": self.http_requests,
+            "calls": self.calls,
+            "errors": self.errors,
+            "epoch": self.epoch,
+        })
+
+    async def handle_advance(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        moved = self.advance(float(body.get("churn", 0.01)), body.get("collections"))
+        return web.json_response({"moved": moved, "epoch": self.epoch})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 ** 2)
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/advance", self.handle_advance)
+        return app
+
+
+async def _serve(config: MockDASConfig, port: int, ready=None):
+    runner = web.AppRunner(MockDAS(config).app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    if ready is not None:
+        ready.set()
+    else:
+        print(f"Mock DAS listening on http://127.0.0.1:{port}/ ({asdict(config)})")
+    await asyncio.Event().wait()
+
+
+def serve(config: MockDASConfig, port: int, ready=None):
+    """
+    Process entry point; the benchmark runner starts this in a child process so the
+    mock's own CPU time does not show up in the bot's numbers.
+    """
+    try:
+        asyncio.run(_serve(config, port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--collections", type=int, default=5)
+    parser.add_argument("--supply", type=int, default=1000)
+    parser.add_argument("--wallets", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    serve(MockDASConfig(args.collections, args.supply, args.wallets, args.latency_ms, args.error_rate, args.seed), args.port)
@@ -0,0 +1,232 @@
+"""
+End-to-end sync benchmark: RoleEngine + RoleSyncer + RoleMutationScheduler against a local
+mock DAS server and fake Discord guilds, with a throwaway SQLite database.
+
+Each pass reports wall time, DAS HTTP requests / JSON-RPC calls, SQLite statements,
+members evaluated and role edits; the run ends with peak memory. Pass 1 is the cold full
+sync; later passes move `--churn` of every collection (or of the first `--churn-collections`)
+to new owners first and show the incremental path. Untouched collections are skipped by the
+fingerprint pre-check unless CRAWL_FINGERPRINT_ENABLED=false.
+
+Usage:
+    python -m benchmarks.run [--scenario small|medium|large] [--passes 3] [--churn 0.01] [--churn-collections N]
+        [--collections N] [--supply N] [--members N] [--wallets N] [--linked 0.5]
+        [--latency-ms 0] [--error-rate 0] [--rps 0] [--edit-latency-ms 0] [--chunked] [--tracemalloc]
+
+HELIUS_* settings (concurrency, batch size, retries) are read from the environment as usual.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+
+from src.db import Database
+from src.helius_client import HeliusClient
+from src.rate_limiter import TokenBucket
+from src.refresh_scheduler import CollectionRefreshScheduler
+from src.role_engine import RoleEngine
+from src.role_scheduler import RoleMutationScheduler
+from src.role_sync import RoleSyncer
+
+from .fake_discord import FakeBot, FakeGuild
+from .mock_das_server import MockDASConfig, collection_address, serve, wallet_address
+
+SCENARIOS = {
+    # collections, supply per collection, guild members
+    "small": (5, 1_000, 2_000),
+    "medium": (20, 5_000, 20_000),
+    "large": (50, 10_000, 100_000),
+}
+
+TIER_THRESHOLDS = (1, 3, 10)
+GUILD_ID = 1
+ROLE_ID_BASE = 10_000
+MEMBER_ID_BASE = 1_000_000
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS.
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class StatementCounter:
+    """
+    Counts SQL statements executed on every pooled connection via sqlite3 trace callbacks.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def _trace(self, statement):
+        self.count += 1
+
+    async def attach(self, db: Database):
+        for conn in [db._writer, *db._all_readers]:
+            await conn.set_trace_callback(self._trace)
+
+
+async def _seed(db: Database, collections: int, members: int, wallets: int, linked: float):
+    await db.init_db()
+    for c in range(collections):
+        address = collection_address(c)
+        await db.add_collection(address, f"Bench {c}")
+        for t, threshold in enumerate(TIER_THRESHOLDS):
+            await db.add_tier(address, threshold, ROLE_ID_BASE + c * len(TIER_THRESHOLDS) + t)
+
+    now = time.time()
+    linked_members = min(int(members * linked), wallets)
+    async with db._transaction() as conn:
+        await conn.executemany(
+            "INSERT INTO users (discord_id, wallet_address, verified_at, last_checked) VALUES (?, ?, ?, ?)",
+            [(MEMBER_ID_BASE + m, wallet_address(m), now, now) for m in range(linked_members)]
+        )
+    return linked_members
+
+
+def _build_guild(collections: int, members: int, edit_latency: float, chunked: bool) -> FakeGuild:
+    guild = FakeGuild(GUILD_ID, edit_latency, chunked)
+    for c in range(collections):
+        for t, threshold in enumerate(TIER_THRESHOLDS):
+            guild.add_role(ROLE_ID_BASE + c * len(TIER_THRESHOLDS) + t, f"Bench {c} x{threshold}")
+    for m in range(members):
+        guild.add_member(MEMBER_ID_BASE + m)
+    return guild
+
+
+async def _mock_stats(session: aiohttp.ClientSession, base_url: str) -> dict:
+    async with session.get(f"{base_url}stats") as response:
+        return await response.json()
+
+
+async def run(args):
+    collections, supply, members = SCENARIOS[args.scenario]
+    collections = args.collections or collections
+    supply = args.supply or supply
+    members = args.members or members
+    wallets = args.wallets or max(1, members // 2)
+
+    port = _free_port()
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    mock_config = MockDASConfig(collections, supply, wallets, args.latency_ms, args.error_rate)
+    mock = ctx.Process(target=serve, args=(mock_config, port, ready), daemon=True)
+    mock.start()
+    if not await asyncio.get_running_loop().run_in_executor(None, ready.wait, 120):
+        raise RuntimeError("mock DAS server did not start")
+    base_url = f"http://127.0.0.1:{port}/"
+
+    print(
+        f"scenario={args.scenario} collections={collections} supply={supply} members={members} "
+        f"wallets={wallets} latency={args.latency_ms}ms error_rate={args.error_rate} rps={args.rps or 'unlimited'}"
+    )
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database()
+        db.db_path = os.path.join(tmp, "bench.db")
+        await db.connect()
+        linked_members = await _seed(db, collections, members, wallets, args.linked)
+        print(f"linked members={linked_members}")
+
+        limiter = TokenBucket(args.rps, max(1, int(args.rps))) if args.rps else TokenBucket(1e9, 10 ** 9)
+        helius = HeliusClient(limiter)
+        helius.url = base_url
+        role_engine = RoleEngine(db, helius)
+        # Every collection is due on every pass, so each pass measures a full crawl.
+        role_engine.refresh_scheduler = CollectionRefreshScheduler(0, 0)
+        scheduler = RoleMutationScheduler()
+        guild = _build_guild(collections, members, args.edit_latency_ms / 1000, args.chunked)
+        syncer = RoleSyncer(FakeBot([guild], db, role_engine, scheduler))
+
+        counter = StatementCounter()
+        await counter.attach(db)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        async with aiohttp.ClientSession() as session:
+            for n in range(1, args.passes + 1):
+                if n > 1 and args.churn:
+                    advance = {"churn": args.churn, "collections": args.churn_collections}
+                    async with session.post(f"{base_url}advance", json=advance) as response:
+                        await response.json()
+
+                before = await _mock_stats(session, base_url)
+                statements = counter.count
+                edits = guild.edits
+                member_queries = guild.member_queries
+                if args.tracemalloc:
+                    tracemalloc.reset_peak()
+
+                start = time.perf_counter()
+                summary = await syncer.run_pass()
+                queued = time.perf_counter() - start
+                await scheduler.join()
+                wall = time.perf_counter() - start
+
+                after = await _mock_stats(session, base_url)
+                row = {
+                    "pass": n,
+                    "mode": summary["mode"] if summary else "skipped",
+                    "wall_s": round(wall, 3),
+                    "sync_s": round(queued, 3),
+                    "drain_s": round(wall - queued, 3),
+                    "http_requests": after["http_requests"] - before["http_requests"],
+                    "rpc_calls": after["calls"] - before["calls"],
+                    "collections_recrawled": len(role_engine.last_refreshed),
+                    "upstream_errors": after["errors"] - before["errors"],
+                    "db_statements": counter.count - statements,
+                    "evaluated": summary["evaluated"] if summary else 0,
+                    "role_edits": guild.edits - edits,
+                    "member_queries": guild.member_queries - member_queries,
+                    "cached_members": len(guild.members),
+                    "timings": {k: round(v, 3) for k, v in (summary or {}).get("timings", {}).items()},
+                }
+                if args.tracemalloc:
+                    row["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+                results.append(row)
+                print(json.dumps(row))
+
+        await scheduler.close()
+        await helius.close()
+        await db.close()
+
+    mock.terminate()
+    mock.join()
+    print(f"peak RSS: {_peak_rss_mb():.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="small")
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--churn", type=float, default=0.01, help="fraction of each collection transferred between passes")
+    parser.add_argument("--churn-collections", type=int, help="only churn the first N collections (default: all)")
+    parser.add_argument("--collections", type=int)
+    parser.add_argument("--supply", type=int)
+    parser.add_argument("--members", type=int)
+    parser.add_argument("--wallets", type=int, help="owner universe (default: members / 2)")
+    parser.add_argument("--linked", type=float, default=0.5, help="fraction of members with a linked wallet")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mock DAS latency per HTTP request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock DAS requests answered with 503")
+    parser.add_argument("--rps", type=float, default=0.0, help="Helius rate limit to apply (0 = unlimited)")
+    parser.add_argument("--edit-latency-ms", type=float, default=0.0, help="fake Discord latency per member edit")
+    parser.add_argument("--chunked", action="store_true", help="start with every member cached (chunk_guilds_at_startup=True)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report traced peak allocations (slower)")
+    asyncio.run(run(parser.parse_args()))
@@ -1,8 +1,9 @@
 import logging
 import asyncio
-from src.config import DISCORD_TOKEN
-from src.bot import bot
-from src.tasks import start_background_tasks
+from src.startup import startup
+
+with startup.phase("import src.config"):
+    from src.config import DISCORD_TOKEN, BOT_MODE
 
 # Configure Logging
 logging.basicConfig(
@@ -12,10 +13,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 async def main():
+    if BOT_MODE == "crawler":
+        from src.crawler import CrawlerWorker
+        await CrawlerWorker().run()
+        return
+
     if not DISCORD_TOKEN:
         logger.error("DISCORD_TOKEN not found in environment variables.")
         return
 
+    # Imported here, not at module level: spawned worker processes (the Helius decoder pool)
+    # re-run this module and must not import discord.py or build the bot.
+    with startup.phase("import src.bot"):
+        from src.bot import bot
+    with startup.phase("import src.tasks"):
+        from src.tasks import start_background_tasks
+
     async with bot:
         start_background_tasks()
         await bot.start(DISCORD_TOKEN)
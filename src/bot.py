@@ -1,36 +1,99 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 import logging
 import random
 import time
-from typing import Optional, Set, Tuple
+from typing import Optional
 
-from .config import GUILD_ID, VERIFICATION_AMOUNT_MIN, VERIFICATION_AMOUNT_MAX, VERIFICATION_EXPIRY_SECONDS
+from .config import (
+    GUILD_ID, VERIFICATION_AMOUNT_MIN, VERIFICATION_AMOUNT_MAX, VERIFICATION_EXPIRY_SECONDS, WEBHOOK_ENABLED, METRICS_ENABLED,
+    BOT_MODE, SHARD_COUNT, SHARD_IDS, HELIUS_RPC_URL, SOLANA_RPC_URL
+)
 from .db import Database
 from .helius_client import HeliusClient
 from .solana_verifier import SolanaVerifier
 from .role_engine import RoleEngine
+from .snapshot_follower import SnapshotFollower
+from .challenge_manager import ChallengeManager
+from .challenge_watcher import ChallengeWatcher
+from .role_scheduler import RoleMutationScheduler, apply_role_changes
+from .role_sync import resolve_members
+from .webhook_server import HeliusWebhookServer
+from .metrics import MetricsServer
+from .startup import startup
 
 logger = logging.getLogger(__name__)
 
-class NFTVerificationBot(commands.Bot):
+# With SHARD_COUNT set, each process runs the shards in SHARD_IDS and only sees their guilds.
+_BotBase = commands.AutoShardedBot if SHARD_COUNT else commands.Bot
+
+class NFTVerificationBot(_BotBase):
     def __init__(self):
-        intents = discord.Intents.all()  # Required for !prefix commands to work
-        super().__init__(command_prefix="!", intents=intents)
+        intents = discord.Intents.default()
+        intents.members = True  # role.members and on-demand member requests for the role sync
+        intents.message_content = True  # Required for !prefix commands to work
+        shard_options = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS or None} if SHARD_COUNT else {}
+        # Members are fetched as the sync needs them instead of caching every guild up front.
+        super().__init__(command_prefix="!", intents=intents, chunk_guilds_at_startup=False, **shard_options)
         
         self.db = Database()
         self.helius = HeliusClient()
-        self.verifier = SolanaVerifier()
-        self.role_engine = RoleEngine(self.db, self.helius)
+        # Challenge checks against the Helius endpoint draw from the crawl's rate limit.
+        self.verifier = SolanaVerifier(self.helius.limiter if SOLANA_RPC_URL == HELIUS_RPC_URL else None)
+        if BOT_MODE == "shard":
+            # Holdings come from the crawler process's published snapshots.
+            self.role_engine = SnapshotFollower(self.db, self.helius)
+        else:
+            self.role_engine = RoleEngine(self.db, self.helius)
+        self.challenges = ChallengeManager(self.db)
+        self.challenge_watcher = ChallengeWatcher(self.challenges, self.verifier)
+        self.role_scheduler = RoleMutationScheduler()
+        self.webhook_server = HeliusWebhookServer()
+        self.metrics_server = MetricsServer()
+        self.holdings_loaded = asyncio.Event()  # set once the cached snapshot is in memory
+        self._warmup = None
         
     async def setup_hook(self):
-        await self.db.init_db()
+        # discord.py connects to the gateway only after setup_hook returns, so keep it short.
+        with startup.phase("setup_hook"):
+            await self.db.connect()
+            await self.db.init_db()
+            await self.challenges.load()
+            self.challenges.start()
+            # Loading a large holdings snapshot takes seconds; do it while the gateway connects.
+            self._warmup = asyncio.create_task(self._load_cached_holdings())
+            if WEBHOOK_ENABLED and BOT_MODE != "shard":
+                await self.webhook_server.start()
+            if METRICS_ENABLED:
+                await self.metrics_server.start()
         # Slash command syncing is now manual via the !sync command.
+
+    async def _load_cached_holdings(self):
+        try:
+            with startup.phase("load cached holdings"):
+                await self.role_engine.load_cached_holdings()
+        except Exception as e:
+            # Lookups fall back to live Helius queries; the first crawl rebuilds the snapshot.
+            logger.exception(f"Could not load cached holdings: {e}")
+        finally:
+            self.holdings_loaded.set()
+
+    async def on_ready(self):
+        startup.report()
             
     async def close(self):
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+        await self.webhook_server.close()
+        await self.metrics_server.close()
+        await self.challenges.close()
+        await self.role_scheduler.close()
         await self.verifier.close()
+        await self.helius.close()
         await super().close()
+        await self.db.close()
 
 bot = NFTVerificationBot()
 
@@ -89,14 +152,26 @@ class VerifyModal(discord.ui.Modal, title="Verify Transaction"):
 
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
+
+        if await self.bot.challenges.get(interaction.user.id, self.wallet_address) is None:
+            await interaction.followup.send("This verification has expired. Please run `/connect_wallet` again.", ephemeral=True)
+            return
         
         signature = self.tx_signature.value.strip()
         success = await self.bot.verifier.verify_transaction(signature, self.wallet_address, self.amount)
         
         if success:
             try:
+                if not await self.bot.challenges.complete(interaction.user.id, self.wallet_address):
+                    # Either the challenge watcher saw the transfer first and linked the wallet,
+                    # or the challenge expired (and was swept) while the transaction was checked.
+                    user = await self.bot.db.get_user(interaction.user.id)
+                    if user is not None and user[1] == self.wallet_address:
+                        await interaction.followup.send(f"Wallet `{self.wallet_address}` is already verified.", ephemeral=True)
+                    else:
+                        await interaction.followup.send("This verification has expired. Please run `/connect_wallet` again.", ephemeral=True)
+                    return
                 await self.bot.db.add_user(interaction.user.id, self.wallet_address)
-                await self.bot.db.delete_challenge(interaction.user.id, self.wallet_address)
                 await interaction.followup.send(f"Success! Wallet `{self.wallet_address}` verified.", ephemeral=True)
                 
                 await update_roles_for_user(interaction.user, self.wallet_address)
@@ -131,14 +206,15 @@ async def handle_connect_logic(interaction: discord.Interaction, bot: 'NFTVerifi
     amount = round(random.uniform(VERIFICATION_AMOUNT_MIN, VERIFICATION_AMOUNT_MAX), 6) # 6 decimals for sufficient entropy
     expires_at = time.time() + VERIFICATION_EXPIRY_SECONDS
     
-    await bot.db.create_challenge(interaction.user.id, wallet_address, amount, expires_at)
+    await bot.challenges.create(interaction.user.id, wallet_address, amount, expires_at)
     
     msg = (
         f"**Wallet Verification**\n"
         f"To verify ownership of `{wallet_address}`, please send exactly `{amount:.6f}` SOL "
         f"from that wallet to itself (self-transfer).\n"
         f"Expires in {VERIFICATION_EXPIRY_SECONDS // 60} minutes.\n\n"
-        f"Click the button below to submit your transaction signature."
+        f"The transfer is detected automatically within a few seconds. "
+        f"If it isn't, click the button below to submit your transaction signature."
     )
     
     view = ConnectView(bot, wallet_address, amount)
@@ -167,14 +243,26 @@ class VerifyModal(discord.ui.Modal, title="Verify Transaction"):
 
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
+
+        if await self.bot.challenges.get(interaction.user.id, self.wallet_address) is None:
+            await interaction.followup.send("This verification has expired. Please run `/connect_wallet` again.", ephemeral=True)
+            return
         
         signature = self.tx_signature.value.strip()
         success = await self.bot.verifier.verify_transaction(signature, self.wallet_address, self.amount)
         
         if success:
             try:
+                if not await self.bot.challenges.complete(interaction.user.id, self.wallet_address):
+                    # Either the challenge watcher saw the transfer first and linked the wallet,
+                    # or the challenge expired (and was swept) while the transaction was checked.
+                    user = await self.bot.db.get_user(interaction.user.id)
+                    if user is not None and user[1] == self.wallet_address:
+                        await interaction.followup.send(f"Wallet `{self.wallet_address}` is already verified.", ephemeral=True)
+                    else:
+                        await interaction.followup.send("This verification has expired. Please run `/connect_wallet` again.", ephemeral=True)
+                    return
                 await self.bot.db.add_user(interaction.user.id, self.wallet_address)
-                await self.bot.db.delete_challenge(interaction.user.id, self.wallet_address)
                 await interaction.followup.send(f"Success! Wallet `{self.wallet_address}` verified.", ephemeral=True)
                 
                 await update_roles_for_user(interaction.user, self.wallet_address)
@@ -248,37 +336,34 @@ async def collection_autocomplete(
 
 # --- Helpers ---
 
-async def update_roles_for_user(member: discord.Member, wallet_address: Optional[str]):
-    roles_to_add_ids, roles_to_remove_ids = await bot.role_engine.calculate_roles(wallet_address)
-    await apply_role_changes(member, roles_to_add_ids, roles_to_remove_ids)
+async def complete_verification(discord_id: int, wallet_address: str):
+    """
+    Links a wallet whose challenge transfer was detected on-chain, updates roles and notifies the user.
+    """
+    if not await bot.challenges.complete(discord_id, wallet_address):
+        return  # Already completed through the modal
 
-async def apply_role_changes(member: discord.Member, roles_to_add_ids: Set[int], roles_to_remove_ids: Set[int]):
-    current_role_ids = {r.id for r in member.roles}
-    
-    # Add
-    to_add = []
-    for rid in roles_to_add_ids:
-        if rid not in current_role_ids:
-            role = member.guild.get_role(rid)
-            if role:
-                to_add.append(role)
-    
-    if to_add:
-        try:
-            await member.add_roles(*to_add, reason="Open Solana Verification")
-        except Exception as e:
-            logger.error(f"Failed to add roles: {e}")
-
-    # Remove
-    to_remove = []
-    for rid in roles_to_remove_ids:
-        if rid in current_role_ids:
-            role = member.guild.get_role(rid)
-            if role:
-                to_remove.append(role)
-                
-    if to_remove:
+    await bot.db.add_user(discord_id, wallet_address)
+
+    roles_to_add_ids, roles_to_remove_ids = await bot.role_engine.calculate_roles(wallet_address)
+    for guild in bot.guilds:
+        member = (await resolve_members(guild, [discord_id])).get(discord_id)
+        if member is None:
+            continue
         try:
-            await member.remove_roles(*to_remove, reason="Solana NFT Verification Sync")
+            await apply_role_changes(member, roles_to_add_ids, roles_to_remove_ids)
         except Exception as e:
-            logger.error(f"Failed to remove roles: {e}")
+            logger.error(f"Failed to update roles: {e}")
+
+    try:
+        user = bot.get_user(discord_id) or await bot.fetch_user(discord_id)
+        await user.send(f"Success! Wallet `{wallet_address}` verified.")
+    except discord.HTTPException as e:
+        logger.warning(f"Could not notify user {discord_id} of verification: {e}")
+
+async def update_roles_for_user(member: discord.Member, wallet_address: Optional[str]):
+    roles_to_add_ids, roles_to_remove_ids = await bot.role_engine.calculate_roles(wallet_address)
+    try:
+        await apply_role_changes(member, roles_to_add_ids, roles_to_remove_ids)
+    except Exception as e:
+        logger.error(f"Failed to update roles: {e}")
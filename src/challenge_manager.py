@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from .config import BOT_MODE, CHALLENGE_SWEEP_SECONDS
+from .db import Database
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class ChallengeManager:
+    """
+    Pending wallet challenges, indexed in memory by (discord_id, wallet) and written through
+    to `wallet_challenges` for durability. Expiry is checked on every lookup; a background
+    sweeper, driven by a heap of expiry times, drops expired challenges from memory and
+    deletes stale rows in one statement.
+
+    In sharded mode (`shared`) other processes create and complete challenges too, so memory
+    is only a fast path: misses and the watcher's pending list go to the database.
+    Challenge rows are tuples of (discord_id, wallet, amount, expires_at).
+    """
+    def __init__(self, db: Database, shared: bool = BOT_MODE == "shard"):
+        self.db = db
+        self.shared = shared
+        self._challenges: Dict[Tuple[int, str], tuple] = {}
+        self._expiries = []  # (expires_at, discord_id, wallet); stale entries are skipped lazily
+        self._wakeup = asyncio.Event()
+        self._sweeper: Optional[asyncio.Task] = None
+        metrics.CHALLENGES_PENDING.set_function(lambda: len(self._challenges))
+
+    def _index(self, row: tuple):
+        discord_id, wallet, _, expires_at = row
+        self._challenges[(discord_id, wallet)] = row
+        heapq.heappush(self._expiries, (expires_at, discord_id, wallet))
+        self._wakeup.set()
+
+    async def load(self):
+        """
+        Drops rows that expired while the bot was down and indexes the rest.
+        """
+        removed = await self.db.delete_expired_challenges(time.time())
+        for row in await self.db.get_pending_challenges():
+            self._index(tuple(row))
+        logger.info(f"Loaded {len(self._challenges)} pending challenge(s); removed {removed} expired")
+
+    def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def create(self, discord_id: int, wallet: str, amount: float, expires_at: float):
+        """
+        Starts (or replaces) the challenge for this user and wallet.
+        """
+        await self.db.create_challenge(discord_id, wallet, amount, expires_at)
+        self._index((discord_id, wallet, amount, expires_at))
+
+    async def get(self, discord_id: int, wallet: str) -> Optional[tuple]:
+        """
+        The pending, unexpired challenge, or None. No database round-trip unless shared.
+        """
+        row = self._challenges.get((discord_id, wallet))
+        if row is None and self.shared:
+            db_row = await self.db.get_challenge(discord_id, wallet)
+            if db_row is not None:
+                row = (db_row[0], db_row[1], db_row[2], db_row[3])
+        if row is None or row[3] <= time.time():
+            return None
+        return row
+
+    async def complete(self, discord_id: int, wallet: str) -> bool:
+        """
+        Removes the challenge. Returns True only for the caller that actually removed it, so
+        the modal and the on-chain watcher cannot both complete the same verification.
+        """
+        self._challenges.pop((discord_id, wallet), None)
+        return await self.db.delete_challenge(discord_id, wallet)
+
+    async def pending(self) -> List[tuple]:
+        """
+        Unexpired challenges for the watcher, in the shape of Database.get_pending_challenges().
+        """
+        if self.shared:
+            return [tuple(row) for row in await self.db.get_pending_challenges()]
+        now = time.time()
+        return [row for row in self._challenges.values() if row[3] > now]
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Forgets challenges that have expired and deletes their rows (plus any stale rows other
+        processes left behind) in one statement. Returns how many left memory.
+        """
+        now = time.time() if now is None else now
+        expired = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, discord_id, wallet = heapq.heappop(self._expiries)
+            row = self._challenges.get((discord_id, wallet))
+            if row is not None and row[3] == expires_at:  # else completed or replaced since
+                del self._challenges[(discord_id, wallet)]
+                expired += 1
+
+        removed = await self.db.delete_expired_challenges(now)
+        if expired:
+            metrics.CHALLENGES_EXPIRED.inc(expired)
+        if expired or removed:
+            logger.info(f"Swept {expired} expired challenge(s) from memory, {removed} row(s) from the database")
+        return expired
+
+    async def _sweep_loop(self):
+        while True:
+            if not self._expiries:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Sleep until the earliest expiry, but at least CHALLENGE_SWEEP_SECONDS so deletes batch up.
+            await asyncio.sleep(max(self._expiries[0][0] - time.time(), CHALLENGE_SWEEP_SECONDS))
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Challenge sweep failed: {e}")
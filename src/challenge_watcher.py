@@ -0,0 +1,84 @@
+import logging
+import time
+from typing import Dict, List, Set, Tuple
+from .config import VERIFICATION_EXPIRY_SECONDS, CHALLENGE_WALLETS_PER_POLL
+from .challenge_manager import ChallengeManager
+from .solana_verifier import SolanaVerifier, find_self_transfer
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tolerated clock difference between our challenge timestamps and on-chain block times.
+CLOCK_SKEW_SECONDS = 30
+
+class ChallengeWatcher:
+    """
+    Detects challenge self-transfers on-chain without the user pasting a signature.
+    Each poll batches getSignaturesForAddress over up to CHALLENGE_WALLETS_PER_POLL pending
+    wallets, least recently checked first, then batch-fetches only the signatures it has not
+    inspected yet. With more wallets pending, each is checked less often instead of the poll
+    growing. Pending challenges come from the ChallengeManager, so a poll normally costs
+    no database query.
+    """
+    def __init__(self, challenges: ChallengeManager, verifier: SolanaVerifier):
+        self.challenges = challenges
+        self.verifier = verifier
+        self._checked: Dict[str, Set[str]] = {}  # wallet -> signatures already inspected
+        self._polled: Dict[str, float] = {}  # wallet -> time.monotonic() of its last check
+
+    async def poll(self) -> List[Tuple[int, str, str]]:
+        """
+        Returns: [(discord_id, wallet, signature)] for challenges completed on-chain.
+        """
+        challenges = await self.challenges.pending()
+        wallets = {wallet for _, wallet, _, _ in challenges}
+
+        # Forget wallets whose challenges were completed or expired.
+        for wallet in list(self._checked):
+            if wallet not in wallets:
+                del self._checked[wallet]
+        for wallet in list(self._polled):
+            if wallet not in wallets:
+                del self._polled[wallet]
+        if not challenges:
+            return []
+
+        due = sorted(wallets, key=lambda wallet: (self._polled.get(wallet, 0.0), wallet))[:max(1, CHALLENGE_WALLETS_PER_POLL)]
+        now = time.monotonic()
+        self._polled.update((wallet, now) for wallet in due)
+        challenges = [challenge for challenge in challenges if challenge[1] in set(due)]
+        signatures = await self.verifier.get_signatures_for_addresses(due)
+
+        # Candidate signatures per challenge: successful, new to us and not older than the challenge.
+        candidates = {}
+        for discord_id, wallet, amount, expires_at in challenges:
+            created_at = expires_at - VERIFICATION_EXPIRY_SECONDS - CLOCK_SKEW_SECONDS
+            checked = self._checked.setdefault(wallet, set())
+            for info in signatures.get(wallet) or []:
+                sig = info.get("signature")
+                if not sig or sig in checked or info.get("err") is not None:
+                    continue
+                block_time = info.get("blockTime")
+                if block_time is None or block_time < created_at:
+                    continue
+                candidates.setdefault(sig, []).append((discord_id, wallet, amount))
+
+        if not candidates:
+            return []
+
+        transactions = await self.verifier.get_transactions(list(candidates))
+        completed = []
+        for sig, tx in transactions.items():
+            if tx is None:
+                # Not fetched (yet); look again on the next poll.
+                continue
+            for discord_id, wallet, amount in candidates[sig]:
+                self._checked[wallet].add(sig)
+                if find_self_transfer(tx, wallet, int(amount * 1_000_000_000)):
+                    logger.info(f"Detected challenge transfer {sig} for user {discord_id} ({wallet})")
+                    metrics.VERIFICATIONS.inc(source="watcher", outcome="verified")
+                    completed.append((discord_id, wallet, sig))
+                else:
+                    metrics.VERIFICATIONS.inc(source="watcher", outcome="no_match")
+
+        return completed
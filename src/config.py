@@ -7,6 +7,15 @@ load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 GUILD_ID = int(os.getenv("GUILD_ID", 0))
 
+# Deployment mode: "all" runs crawling and role sync in one process. For larger deployments run one
+# "crawler" process (no Discord connection; publishes holdings snapshots to the database) plus
+# "shard" processes that only apply roles for the guilds on their gateway shards.
+BOT_MODE = os.getenv("BOT_MODE", "all").lower()
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0))  # Total gateway shards across all processes (0 = unsharded)
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()]  # Shards run by this process (default: all)
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", 15))  # How often a shard process checks for a new snapshot
+SNAPSHOT_CHANGE_RETENTION = int(os.getenv("SNAPSHOT_CHANGE_RETENTION", 200))  # Snapshot versions whose changed-wallet lists are kept
+
 # Helius Configuration
 HELIUS_RPC_URL = os.getenv("HELIUS_RPC_URL")
 if HELIUS_RPC_URL:
@@ -21,11 +30,77 @@ SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", HELIUS_RPC_URL)
 
 # Database Configuration
 DB_PATH = os.getenv("DB_PATH", "bot_database.db")
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", 4))  # Read-only connections kept open alongside the writer
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 16384))  # Page cache per connection
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 64 * 1024 * 1024))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))  # Prepared statements cached per connection
 
 # Verification Configuration
 VERIFICATION_AMOUNT_MIN = 0.000001
 VERIFICATION_AMOUNT_MAX = 0.000099
 VERIFICATION_EXPIRY_SECONDS = 300  # 5 minutes
+CHALLENGE_WATCHER_ENABLED = os.getenv("CHALLENGE_WATCHER_ENABLED", "true").lower() in ("1", "true", "yes")
+CHALLENGE_POLL_SECONDS = float(os.getenv("CHALLENGE_POLL_SECONDS", 3))  # How often pending challenges are checked on-chain
+CHALLENGE_RPC_BATCH_SIZE = int(os.getenv("CHALLENGE_RPC_BATCH_SIZE", 50))  # Calls per JSON-RPC batch
+CHALLENGE_WALLETS_PER_POLL = int(os.getenv("CHALLENGE_WALLETS_PER_POLL", 10))  # Pending wallets checked per poll; beyond that they take turns
+CHALLENGE_SWEEP_SECONDS = float(os.getenv("CHALLENGE_SWEEP_SECONDS", 30))  # Minimum gap between expired-challenge sweeps (batches deletes)
+CHALLENGE_SIGNATURE_LIMIT = int(os.getenv("CHALLENGE_SIGNATURE_LIMIT", 10))  # Recent signatures inspected per wallet
+
+# Role Sync Configuration
+SYNC_INTERVAL_MINUTES = float(os.getenv("SYNC_INTERVAL_MINUTES", 1))  # How often the sync loop checks for collections due a crawl
+SYNC_FULL_RESYNC_SECONDS = float(os.getenv("SYNC_FULL_RESYNC_SECONDS", 720))  # A pass this long after the last full one re-checks all members, others only changes
+
+# Adaptive per-collection crawl cadence: busy collections are re-crawled often, quiet ones rarely
+COLLECTION_REFRESH_MIN_SECONDS = float(os.getenv("COLLECTION_REFRESH_MIN_SECONDS", 120))
+COLLECTION_REFRESH_MAX_SECONDS = float(os.getenv("COLLECTION_REFRESH_MAX_SECONDS", 3600))
+COLLECTION_REFRESH_TARGET_CHANGES = float(os.getenv("COLLECTION_REFRESH_TARGET_CHANGES", 20))  # Ownership changes a crawl should find
+
+# Crawl pre-check: hash of the most recently active assets; unchanged collections skip the full crawl
+CRAWL_FINGERPRINT_ENABLED = os.getenv("CRAWL_FINGERPRINT_ENABLED", "true").lower() in ("1", "true", "yes")
+CRAWL_FINGERPRINT_SIZE = int(os.getenv("CRAWL_FINGERPRINT_SIZE", 50))  # Assets hashed per collection
+CRAWL_FINGERPRINT_MAX_AGE_SECONDS = float(os.getenv("CRAWL_FINGERPRINT_MAX_AGE_SECONDS", 6 * 3600))  # Full crawl at least this often anyway
+
+ROLE_MUTATION_CONCURRENCY = int(os.getenv("ROLE_MUTATION_CONCURRENCY", 2))  # Parallel member edits per guild
+
+HOLDINGS_CACHE_TTL = float(os.getenv("HOLDINGS_CACHE_TTL", 900))  # Seconds a crawled collection answers instant lookups
+WALLET_LOOKUP_CACHE_SIZE = int(os.getenv("WALLET_LOOKUP_CACHE_SIZE", 4096))  # Live (wallet, collection) counts kept in memory
+WALLET_LOOKUP_CACHE_TTL = float(os.getenv("WALLET_LOOKUP_CACHE_TTL", 30))  # Seconds a live lookup is reused
+
+# Helius Webhook Receiver (event-driven updates; the full crawl becomes a reconciliation job)
+WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() in ("1", "true", "yes")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/helius-webhook")
+WEBHOOK_AUTH_TOKEN = os.getenv("WEBHOOK_AUTH_TOKEN")  # Must match the webhook's authHeader if set
+WEBHOOK_DEBOUNCE_SECONDS = float(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", 1.0))  # Batch bursts of events
+WEBHOOK_RECONCILE_MINUTES = float(os.getenv("WEBHOOK_RECONCILE_MINUTES", 60))  # Full crawl cadence with webhooks
 
 # Rate Limits
-HELIUS_RATE_LIMIT_DELAY = 1.1  # Seconds between requests (per specs)
+HELIUS_REQUESTS_PER_SECOND = float(os.getenv("HELIUS_REQUESTS_PER_SECOND", 10))  # Sustained DAS request rate (match your plan)
+HELIUS_BURST = int(os.getenv("HELIUS_BURST", 10))  # Requests allowed back-to-back before the rate applies
+HELIUS_PAGE_CONCURRENCY = int(os.getenv("HELIUS_PAGE_CONCURRENCY", 4))  # Max pages of one listing in flight
+HELIUS_COLLECTION_CONCURRENCY = int(os.getenv("HELIUS_COLLECTION_CONCURRENCY", 8))  # Collections crawled at once
+HELIUS_MAX_RETRIES = int(os.getenv("HELIUS_MAX_RETRIES", 4))  # Retries for 429/5xx/timeouts before a request fails
+HELIUS_BACKOFF_BASE = float(os.getenv("HELIUS_BACKOFF_BASE", 0.5))  # Seconds; doubles per attempt, full jitter
+HELIUS_BACKOFF_MAX = float(os.getenv("HELIUS_BACKOFF_MAX", 30))
+HELIUS_BREAKER_THRESHOLD = int(os.getenv("HELIUS_BREAKER_THRESHOLD", 8))  # Consecutive failures that open the circuit
+HELIUS_BREAKER_RESET_SECONDS = float(os.getenv("HELIUS_BREAKER_RESET_SECONDS", 60))
+HELIUS_MAX_BATCH_SIZE = int(os.getenv("HELIUS_MAX_BATCH_SIZE", 10))  # DAS calls per JSON-RPC batch (1 disables batching)
+HELIUS_BATCH_WINDOW = float(os.getenv("HELIUS_BATCH_WINDOW_MS", 5)) / 1000  # How long a call waits for batch-mates
+HELIUS_PROJECT_ASSETS = os.getenv("HELIUS_PROJECT_ASSETS", "true").lower() in ("1", "true", "yes")  # Keep only id/owner/grouping/burnt per asset
+HELIUS_DECODE_OFFLOAD_BYTES = int(os.getenv("HELIUS_DECODE_OFFLOAD_BYTES", 256 * 1024))  # Bigger responses are decoded off the event loop (0 = never)
+HELIUS_DECODE_PROCESSES = int(os.getenv("HELIUS_DECODE_PROCESSES", 1))  # Decoder worker processes (0 = use a thread instead)
+
+# Helius HTTP Connection Pool
+HELIUS_MAX_CONNECTIONS = int(os.getenv("HELIUS_MAX_CONNECTIONS", 20))  # Keep-alive connections per client
+HELIUS_DNS_CACHE_TTL = int(os.getenv("HELIUS_DNS_CACHE_TTL", 300))  # Seconds
+HELIUS_KEEPALIVE_TIMEOUT = float(os.getenv("HELIUS_KEEPALIVE_TIMEOUT", 60))  # Seconds an idle connection is kept
+HELIUS_REQUEST_TIMEOUT = float(os.getenv("HELIUS_REQUEST_TIMEOUT", 30))  # Total seconds per request
+HELIUS_CONNECT_TIMEOUT = float(os.getenv("HELIUS_CONNECT_TIMEOUT", 10))
+
+# Metrics (Prometheus text format on a local HTTP endpoint)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from .config import SYNC_INTERVAL_MINUTES, WEBHOOK_ENABLED, WEBHOOK_RECONCILE_MINUTES, METRICS_ENABLED
+from .db import Database
+from .helius_client import HeliusClient
+from .role_engine import RoleEngine
+from .webhook_server import HeliusWebhookServer
+from .metrics import MetricsServer
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class CrawlerWorker:
+    """
+    BOT_MODE=crawler: crawls the tracked collections once for the whole deployment and
+    publishes holdings snapshots through the database (nft_cache plus a snapshot version).
+    It has no Discord connection; shard processes pick the snapshots up and apply roles.
+    """
+    def __init__(self):
+        self.db = Database()
+        self.helius = HeliusClient()
+        self.role_engine = RoleEngine(self.db, self.helius)
+        self.webhook_server = HeliusWebhookServer()
+        self.metrics_server = MetricsServer()
+
+    async def start(self):
+        await self.db.connect()
+        await self.db.init_db()
+        await self.role_engine.load_cached_holdings()
+        if WEBHOOK_ENABLED:
+            # Webhook refreshes are published like crawls, so shards see them on their next poll.
+            self.webhook_server.on_wallets_changed = self.refresh_linked_wallets
+            await self.webhook_server.start()
+        if METRICS_ENABLED:
+            await self.metrics_server.start()
+
+    async def close(self):
+        await self.webhook_server.close()
+        await self.metrics_server.close()
+        await self.helius.close()
+        await self.db.close()
+
+    async def refresh_linked_wallets(self, wallets):
+        """
+        Webhook handler: only linked wallets affect roles, so only those are re-queried.
+        """
+        owners = await self.db.get_users_by_wallets(wallets)
+        if owners:
+            await self.role_engine.refresh_wallet_holdings(owners)
+
+    async def crawl_once(self):
+        start = time.perf_counter()
+        await self.role_engine.get_global_holdings()
+        metrics.SYNC_PHASE_SECONDS.observe(time.perf_counter() - start, phase="crawl")
+        metrics.SYNC_INCOMPLETE_COLLECTIONS.set(len(self.role_engine.incomplete_collections))
+
+    async def run(self):
+        interval = (WEBHOOK_RECONCILE_MINUTES if WEBHOOK_ENABLED else SYNC_INTERVAL_MINUTES) * 60
+        await self.start()
+        logger.info(f"Crawler worker started; checking for due collections every {interval:.0f}s")
+        try:
+            while True:
+                try:
+                    await self.crawl_once()
+                except Exception as e:
+                    logger.error(f"Crawl error: {e}")
+                await asyncio.sleep(interval)
+        finally:
+            await self.close()
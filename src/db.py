@@ -1,13 +1,133 @@
 import aiosqlite
+import asyncio
+import logging
 import time
-from .config import DB_PATH
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+from .config import (
+    DB_PATH, DB_READ_POOL_SIZE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS, DB_STATEMENT_CACHE_SIZE,
+    SNAPSHOT_CHANGE_RETENTION, BOT_MODE
+)
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram and error counter per public Database method.
+_timed = metrics.timed(metrics.DB_OPERATION_SECONDS, metrics.DB_OPERATION_ERRORS)
 
 class Database:
+    """
+    Long-lived SQLite connection pool: one writer plus N read-only readers, in WAL mode.
+    Statements are cached per connection by sqlite3, so repeated queries are prepared once.
+    """
     def __init__(self):
         self.db_path = DB_PATH
+        self.read_pool_size = max(1, DB_READ_POOL_SIZE)
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._readers = None
+        self._all_readers = []
+        self._connect_lock = asyncio.Lock()
+        # Bumped whenever collections or tiers change so cached tier tables know to recompile.
+        self.tiers_version = 0
+        # Only a crawler process has shard followers reading the snapshot change log.
+        self.publish_snapshots = BOT_MODE == "crawler"
+
+    # --- Lifecycle ---
+
+    async def connect(self):
+        """
+        Opens the writer and reader connections. Safe to call more than once.
+        """
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+
+            writer = await self._open_connection()
+            # WAL must be enabled from a writable connection before readers attach.
+            await writer.execute("PRAGMA journal_mode=WAL")
+            await writer.execute("PRAGMA synchronous=NORMAL")
+
+            readers = asyncio.Queue()
+            all_readers = []
+            for _ in range(self.read_pool_size):
+                reader = await self._open_connection()
+                await reader.execute("PRAGMA query_only=ON")
+                readers.put_nowait(reader)
+                all_readers.append(reader)
+
+            self._writer = writer
+            self._readers = readers
+            self._all_readers = all_readers
+            logger.info(f"Opened SQLite pool at {self.db_path} (1 writer, {self.read_pool_size} readers)")
+
+    async def close(self):
+        async with self._connect_lock:
+            if self._writer is None:
+                return
+
+            for reader in self._all_readers:
+                await reader.close()
+            await self._writer.close()
+
+            self._writer = None
+            self._readers = None
+            self._all_readers = []
+
+    async def _open_connection(self):
+        conn = await aiosqlite.connect(self.db_path, cached_statements=DB_STATEMENT_CACHE_SIZE)
+        await conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+        await conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+        await conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    # --- Pool helpers ---
+
+    @asynccontextmanager
+    async def _reader(self):
+        if self._writer is None:
+            await self.connect()
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """
+        Serialises writes on the single writer connection and commits (or rolls back) on exit.
+        """
+        if self._writer is None:
+            await self.connect()
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except Exception:
+                await self._writer.rollback()
+                raise
+
+    async def _fetchone(self, sql: str, params: tuple = ()):
+        async with self._reader() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def _fetchall(self, sql: str, params: tuple = ()):
+        async with self._reader() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+    async def _execute(self, sql: str, params: tuple = ()):
+        async with self._transaction() as db:
+            await db.execute(sql, params)
+
+    # --- Schema ---
 
+    @_timed
     async def init_db(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             await db.executescript("""
                 CREATE TABLE IF NOT EXISTS users (
                     discord_id INTEGER PRIMARY KEY,
@@ -15,7 +135,7 @@ class Database:
                     verified_at REAL,
                     last_checked REAL
                 );
-                
+
                 CREATE TABLE IF NOT EXISTS wallet_challenges (
                     discord_id INTEGER,
                     wallet TEXT,
@@ -25,12 +145,12 @@ class Database:
                     status TEXT,
                     PRIMARY KEY (discord_id, wallet)
                 );
-                
+
                 CREATE TABLE IF NOT EXISTS collections (
                     collection_address TEXT PRIMARY KEY,
                     name TEXT
                 );
-                
+
                 CREATE TABLE IF NOT EXISTS tiers (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     collection_address TEXT,
@@ -38,7 +158,7 @@ class Database:
                     role_id INTEGER,
                     FOREIGN KEY(collection_address) REFERENCES collections(collection_address) ON DELETE CASCADE
                 );
-                
+
                 CREATE TABLE IF NOT EXISTS nft_cache (
                     wallet TEXT,
                     collection TEXT,
@@ -46,99 +166,319 @@ class Database:
                     last_updated REAL,
                     PRIMARY KEY (wallet, collection)
                 );
+
+                CREATE TABLE IF NOT EXISTS nft_cache_meta (
+                    collection TEXT PRIMARY KEY,
+                    last_updated REAL,
+                    fingerprint TEXT,
+                    crawled_at REAL
+                );
+
+                -- Every holdings write publishes a version; shard processes replay the changed wallets.
+                CREATE TABLE IF NOT EXISTS snapshot_versions (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    published_at REAL
+                );
+
+                CREATE TABLE IF NOT EXISTS snapshot_changes (
+                    version INTEGER,
+                    wallet TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_snapshot_changes_version ON snapshot_changes(version);
             """)
-            await db.commit()
 
+            # Databases created before crawl fingerprints existed
+            async with db.execute("PRAGMA table_info(nft_cache_meta)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "fingerprint" not in columns:
+                await db.execute("ALTER TABLE nft_cache_meta ADD COLUMN fingerprint TEXT")
+            if "crawled_at" not in columns:
+                await db.execute("ALTER TABLE nft_cache_meta ADD COLUMN crawled_at REAL")
+
+    # --- Users ---
+
+    @_timed
     async def get_user(self, discord_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM users WHERE discord_id = ?", (discord_id,)) as cursor:
-                return await cursor.fetchone()
+        return await self._fetchone("SELECT * FROM users WHERE discord_id = ?", (discord_id,))
 
+    @_timed
     async def add_user(self, discord_id: int, wallet_address: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT OR REPLACE INTO users (discord_id, wallet_address, verified_at, last_checked) VALUES (?, ?, ?, ?)",
-                (discord_id, wallet_address, time.time(), time.time())
-            )
-            await db.commit()
+        await self._execute(
+            "INSERT OR REPLACE INTO users (discord_id, wallet_address, verified_at, last_checked) VALUES (?, ?, ?, ?)",
+            (discord_id, wallet_address, time.time(), time.time())
+        )
 
+    @_timed
     async def remove_user(self, discord_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM users WHERE discord_id = ?", (discord_id,))
-            await db.commit()
+        await self._execute("DELETE FROM users WHERE discord_id = ?", (discord_id,))
 
-    async def create_challenge(self, discord_id: int, wallet: str, amount: float, expires_at: float):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT OR REPLACE INTO wallet_challenges (discord_id, wallet, amount, expires_at, status) VALUES (?, ?, ?, ?, 'PENDING')",
-                (discord_id, wallet, amount, expires_at)
+    @_timed
+    async def get_wallet_map(self) -> dict:
+        """
+        Loads every linked user in one query.
+        Returns: {discord_id: wallet_address}
+        """
+        rows = await self._fetchall("SELECT discord_id, wallet_address FROM users")
+        return {discord_id: wallet for discord_id, wallet in rows}
+
+    @_timed
+    async def get_users_by_wallets(self, wallets: list) -> dict:
+        """
+        Returns: {wallet_address: discord_id} for the linked wallets among `wallets`.
+        """
+        owners = {}
+        wallets = list(wallets)
+        for i in range(0, len(wallets), 500):
+            chunk = wallets[i:i + 500]
+            rows = await self._fetchall(
+                f"SELECT discord_id, wallet_address FROM users WHERE wallet_address IN ({','.join('?' * len(chunk))})",
+                tuple(chunk)
             )
-            await db.commit()
+            owners.update({wallet: discord_id for discord_id, wallet in rows})
+        return owners
+
+    # --- Challenges ---
 
+    @_timed
+    async def create_challenge(self, discord_id: int, wallet: str, amount: float, expires_at: float):
+        await self._execute(
+            "INSERT OR REPLACE INTO wallet_challenges (discord_id, wallet, amount, expires_at, status) VALUES (?, ?, ?, ?, 'PENDING')",
+            (discord_id, wallet, amount, expires_at)
+        )
+
+    @_timed
     async def get_challenge(self, discord_id: int, wallet: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute(
-                "SELECT * FROM wallet_challenges WHERE discord_id = ? AND wallet = ?", 
-                (discord_id, wallet)
-            ) as cursor:
-                return await cursor.fetchone()
+        return await self._fetchone(
+            "SELECT * FROM wallet_challenges WHERE discord_id = ? AND wallet = ?",
+            (discord_id, wallet)
+        )
 
-    async def delete_challenge(self, discord_id: int, wallet: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+    @_timed
+    async def get_pending_challenges(self):
+        """
+        Unexpired PENDING challenges as rows of (discord_id, wallet, amount, expires_at).
+        """
+        return await self._fetchall(
+            "SELECT discord_id, wallet, amount, expires_at FROM wallet_challenges WHERE status = 'PENDING' AND expires_at > ?",
+            (time.time(),)
+        )
+
+    @_timed
+    async def delete_challenge(self, discord_id: int, wallet: str) -> bool:
+        """
+        Returns True if this call removed the challenge (False if it was already gone).
+        """
+        async with self._transaction() as db:
+            cursor = await db.execute(
                 "DELETE FROM wallet_challenges WHERE discord_id = ? AND wallet = ?",
                 (discord_id, wallet)
             )
-            await db.commit()
+            return cursor.rowcount > 0
+
+    @_timed
+    async def delete_expired_challenges(self, now: float) -> int:
+        """
+        Removes every challenge that expired by `now`, whichever process created it.
+        Returns the number of rows deleted.
+        """
+        async with self._transaction() as db:
+            cursor = await db.execute("DELETE FROM wallet_challenges WHERE expires_at <= ?", (now,))
+            return cursor.rowcount
 
+    # --- Collections & Tiers ---
+
+    @_timed
     async def add_collection(self, address: str, name: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT OR IGNORE INTO collections (collection_address, name) VALUES (?, ?)",
-                (address, name)
-            )
-            await db.commit()
+        await self._execute(
+            "INSERT OR IGNORE INTO collections (collection_address, name) VALUES (?, ?)",
+            (address, name)
+        )
+        self.tiers_version += 1
 
+    @_timed
     async def remove_collection(self, address: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM collections WHERE collection_address = ?", (address,))
-            await db.commit()
+        await self._execute("DELETE FROM collections WHERE collection_address = ?", (address,))
+        self.tiers_version += 1
 
+    @_timed
     async def get_all_collections(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM collections") as cursor:
-                return await cursor.fetchall()
+        return await self._fetchall("SELECT * FROM collections")
 
+    @_timed
     async def get_collection(self, address: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM collections WHERE collection_address = ?", (address,)) as cursor:
-                return await cursor.fetchone()
+        return await self._fetchone("SELECT * FROM collections WHERE collection_address = ?", (address,))
 
+    @_timed
     async def add_tier(self, collection: str, min_amount: int, role_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO tiers (collection_address, min_amount, role_id) VALUES (?, ?, ?)",
-                (collection, min_amount, role_id)
-            )
-            await db.commit()
+        await self._execute(
+            "INSERT INTO tiers (collection_address, min_amount, role_id) VALUES (?, ?, ?)",
+            (collection, min_amount, role_id)
+        )
+        self.tiers_version += 1
 
+    @_timed
     async def remove_tier(self, collection: str, role_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "DELETE FROM tiers WHERE collection_address = ? AND role_id = ?",
-                (collection, role_id)
-            )
-            await db.commit()
+        await self._execute(
+            "DELETE FROM tiers WHERE collection_address = ? AND role_id = ?",
+            (collection, role_id)
+        )
+        self.tiers_version += 1
 
+    @_timed
     async def get_tiers(self, collection: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute(
-                "SELECT * FROM tiers WHERE collection_address = ? ORDER BY min_amount DESC",
-                (collection,)
-            ) as cursor:
-                return await cursor.fetchall()
-                
+        return await self._fetchall(
+            "SELECT * FROM tiers WHERE collection_address = ? ORDER BY min_amount DESC",
+            (collection,)
+        )
+
+    @_timed
     async def get_all_tiers(self):
-         async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM tiers") as cursor:
-                 return await cursor.fetchall()
+        return await self._fetchall("SELECT * FROM tiers")
+
+    @_timed
+    async def get_tracked_tiers(self):
+        """
+        Tiers belonging to tracked collections only.
+        Returns rows of (id, collection_address, min_amount, role_id).
+        """
+        return await self._fetchall(
+            "SELECT t.id, t.collection_address, t.min_amount, t.role_id FROM tiers t "
+            "JOIN collections c ON c.collection_address = t.collection_address ORDER BY t.id"
+        )
+
+    # --- Holdings Cache ---
+
+    @_timed
+    async def load_holdings_snapshot(self) -> Tuple[dict, dict]:
+        """
+        Loads the last persisted global holdings.
+        Returns: ({wallet: {collection: amount}}, {collection: last_updated})
+        """
+        holdings = {}
+        for wallet, collection, amount in await self._fetchall("SELECT wallet, collection, amount FROM nft_cache"):
+            holdings.setdefault(wallet, {})[collection] = amount
+        return holdings, await self.get_collection_timestamps()
+
+    @_timed
+    async def get_collection_timestamps(self) -> dict:
+        """
+        Returns: {collection: unix time its cached holdings were last confirmed current}
+        """
+        rows = await self._fetchall("SELECT collection, last_updated FROM nft_cache_meta")
+        return {collection: last_updated for collection, last_updated in rows}
+
+    @_timed
+    async def load_wallets_holdings(self, wallets) -> dict:
+        """
+        Returns: {wallet: {collection: amount}} for the given wallets; wallets holding nothing are left out.
+        """
+        holdings = {}
+        wallets = list(wallets)
+        for i in range(0, len(wallets), 500):
+            chunk = wallets[i:i + 500]
+            rows = await self._fetchall(
+                f"SELECT wallet, collection, amount FROM nft_cache WHERE wallet IN ({','.join('?' * len(chunk))})",
+                tuple(chunk)
+            )
+            for wallet, collection, amount in rows:
+                holdings.setdefault(wallet, {})[collection] = amount
+        return holdings
+
+    @_timed
+    async def load_collection_fingerprints(self) -> dict:
+        """
+        Returns: {collection: (fingerprint, crawled_at)} for collections with a stored fingerprint.
+        """
+        rows = await self._fetchall("SELECT collection, fingerprint, crawled_at FROM nft_cache_meta WHERE fingerprint IS NOT NULL")
+        return {collection: (fingerprint, crawled_at) for collection, fingerprint, crawled_at in rows}
+
+    @_timed
+    async def save_holdings_changes(self, upserts: list, deletes: list, collections: list, updated_at: float, fingerprints: dict = None):
+        """
+        Applies a holdings diff in one transaction.
+        upserts: [(wallet, collection, amount)]
+        deletes: [(wallet, collection)]
+        collections: collections whose snapshot is now current as of updated_at
+        fingerprints: {collection: (fingerprint, crawled_at)} to store alongside
+        """
+        async with self._transaction() as db:
+            if deletes:
+                await db.executemany("DELETE FROM nft_cache WHERE wallet = ? AND collection = ?", deletes)
+            if upserts:
+                await db.executemany(
+                    "INSERT OR REPLACE INTO nft_cache (wallet, collection, amount, last_updated) VALUES (?, ?, ?, ?)",
+                    [(wallet, collection, amount, updated_at) for wallet, collection, amount in upserts]
+                )
+            await db.executemany(
+                "INSERT INTO nft_cache_meta (collection, last_updated) VALUES (?, ?) "
+                "ON CONFLICT(collection) DO UPDATE SET last_updated = excluded.last_updated",
+                [(collection, updated_at) for collection in collections]
+            )
+            if fingerprints:
+                await db.executemany(
+                    "UPDATE nft_cache_meta SET fingerprint = ?, crawled_at = ? WHERE collection = ?",
+                    [(fingerprint, crawled_at, collection) for collection, (fingerprint, crawled_at) in fingerprints.items()]
+                )
+            await db.execute("DELETE FROM nft_cache_meta WHERE collection NOT IN (SELECT collection_address FROM collections)")
+            changed = {wallet for wallet, _, _ in upserts}
+            changed.update(wallet for wallet, _ in deletes)
+            await self._publish(db, changed, updated_at)
+
+    @_timed
+    async def replace_wallet_holdings(self, holdings: dict, updated_at: float):
+        """
+        Overwrites the cached rows of specific wallets in one transaction.
+        holdings: {wallet: {collection: amount}}; an empty dict clears the wallet.
+        """
+        async with self._transaction() as db:
+            await db.executemany("DELETE FROM nft_cache WHERE wallet = ?", [(wallet,) for wallet in holdings])
+            await db.executemany(
+                "INSERT INTO nft_cache (wallet, collection, amount, last_updated) VALUES (?, ?, ?, ?)",
+                [
+                    (wallet, collection, amount, updated_at)
+                    for wallet, colls in holdings.items()
+                    for collection, amount in colls.items()
+                ]
+            )
+            await self._publish(db, holdings, updated_at)
+
+    # --- Snapshot publication (sharded mode) ---
+
+    async def _publish(self, db, wallets, published_at: float):
+        """
+        Records a new snapshot version and the wallets it changed, inside the caller's
+        transaction, and drops change logs older than SNAPSHOT_CHANGE_RETENTION versions.
+        A no-op unless `publish_snapshots` (BOT_MODE=crawler).
+        """
+        if not self.publish_snapshots:
+            return
+        cursor = await db.execute("INSERT INTO snapshot_versions (published_at) VALUES (?)", (published_at,))
+        version = cursor.lastrowid
+        await db.executemany("INSERT INTO snapshot_changes (version, wallet) VALUES (?, ?)", [(version, wallet) for wallet in wallets])
+        cutoff = version - max(1, SNAPSHOT_CHANGE_RETENTION)
+        await db.execute("DELETE FROM snapshot_changes WHERE version <= ?", (cutoff,))
+        await db.execute("DELETE FROM snapshot_versions WHERE version <= ?", (cutoff,))
+
+    @_timed
+    async def get_snapshot_version(self) -> int:
+        row = await self._fetchone("SELECT MAX(version) FROM snapshot_versions")
+        return row[0] or 0
+
+    @_timed
+    async def get_snapshot_changes(self, since: int) -> Tuple[int, Optional[set]]:
+        """
+        Wallets whose cached holdings changed in the versions after `since`.
+        Returns: (latest version, {wallet}), or (latest version, None) when the change log
+        no longer reaches back to `since` and the whole snapshot must be reloaded.
+        """
+        latest, oldest = await self._fetchone("SELECT MAX(version), MIN(version) FROM snapshot_versions")
+        if not latest or latest <= since:
+            return latest or 0, set()
+        if since < oldest - 1:
+            return latest, None
+        rows = await self._fetchall(
+            "SELECT DISTINCT wallet FROM snapshot_changes WHERE version > ? AND version <= ?",
+            (since, latest)
+        )
+        return latest, {row[0] for row in rows}
@@ -1,121 +1,429 @@
 import aiohttp
 import asyncio
+import itertools
+import json
 import logging
-from .config import HELIUS_RPC_URL, HELIUS_RATE_LIMIT_DELAY
+import multiprocessing
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Optional
+from .config import (
+    HELIUS_RPC_URL, HELIUS_MAX_CONNECTIONS, HELIUS_DNS_CACHE_TTL,
+    HELIUS_KEEPALIVE_TIMEOUT, HELIUS_REQUEST_TIMEOUT, HELIUS_CONNECT_TIMEOUT,
+    HELIUS_REQUESTS_PER_SECOND, HELIUS_BURST, HELIUS_PAGE_CONCURRENCY,
+    HELIUS_MAX_BATCH_SIZE, HELIUS_BATCH_WINDOW, HELIUS_MAX_RETRIES, HELIUS_BACKOFF_BASE,
+    HELIUS_BACKOFF_MAX, HELIUS_BREAKER_THRESHOLD, HELIUS_BREAKER_RESET_SECONDS,
+    HELIUS_PROJECT_ASSETS, HELIUS_DECODE_OFFLOAD_BYTES, HELIUS_DECODE_PROCESSES
+)
+from .circuit_breaker import CircuitBreaker
+from .rate_limiter import TokenBucket
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib decoder is slower but equivalent
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+class HeliusError(Exception):
+    """
+    A DAS request failed for good (after retries, or with the circuit breaker open).
+    """
+
+def project_asset(asset: dict) -> dict:
+    """
+    Keeps only what the bot reads from a DAS asset: id, owner, collection grouping and burnt flag.
+    """
+    return {
+        "id": asset.get("id"),
+        "ownership": {"owner": (asset.get("ownership") or {}).get("owner")},
+        "grouping": [
+            {"group_key": group.get("group_key"), "group_value": group.get("group_value")}
+            for group in asset.get("grouping") or [] if isinstance(group, dict)
+        ],
+        "burnt": asset.get("burnt", False),
+    }
+
+def decode_response(raw: bytes, project: bool = True):
+    """
+    Decodes a JSON-RPC response (single or batch), slimming every result item with
+    project_asset() when `project` is set. Module-level so a worker process can run it.
+    """
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if project:
+        for response in data if isinstance(data, list) else [data]:
+            result = response.get("result") if isinstance(response, dict) else None
+            if isinstance(result, dict) and isinstance(result.get("items"), list):
+                result["items"] = [project_asset(asset) for asset in result["items"] if isinstance(asset, dict)]
+    return data
+
+def _retryable_rpc_error(item) -> bool:
+    """
+    True for a batch entry that is missing or failed transiently: rate limiting, an internal
+    error or the implementation-defined server-error range (timeouts, overloaded nodes).
+    Invalid requests and params (e.g. a mistyped collection address) fail straight away.
+    """
+    if not isinstance(item, dict):
+        return True
+    if "result" in item:
+        return False
+    error = item.get("error")
+    code = error.get("code") if isinstance(error, dict) else None
+    return code in (429, -32429, -32603) or (isinstance(code, int) and -32099 <= code <= -32000)
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(HELIUS_BACKOFF_MAX, HELIUS_BACKOFF_BASE * 2 ** attempt))
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
 class HeliusClient:
-    def __init__(self):
+    """
+    Async Helius DAS client. Assets are returned projected to id, ownership.owner, grouping and
+    burnt (HELIUS_PROJECT_ASSETS=false keeps them whole); responses of HELIUS_DECODE_OFFLOAD_BYTES
+    or more are decoded in a worker process (or thread) so big pages do not stall the event loop.
+    """
+    def __init__(self, limiter: Optional[TokenBucket] = None):
         self.url = HELIUS_RPC_URL
+        self.limiter = limiter or TokenBucket(HELIUS_REQUESTS_PER_SECOND, HELIUS_BURST)
+        self.breaker = CircuitBreaker("helius", HELIUS_BREAKER_THRESHOLD, HELIUS_BREAKER_RESET_SECONDS)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ids = itertools.count(1)
+        self._batch = []  # [(payload, future)] waiting for the next flush
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks = set()
+        self._decoder: Optional[Executor] = None
+        metrics.HELIUS_BREAKER_OPEN.set_function(lambda: int(self.breaker.state != "closed"))
 
-    async def get_assets_by_group(self, collection_address: str, page: int = 1, limit: int = 1000):
+    async def _get_session(self) -> aiohttp.ClientSession:
         """
-        Fetches assets for a specific collection (group).
+        Returns the shared keep-alive session, creating it on first use.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HELIUS_MAX_CONNECTIONS,
+                ttl_dns_cache=HELIUS_DNS_CACHE_TTL,
+                keepalive_timeout=HELIUS_KEEPALIVE_TIMEOUT,
+            )
+            timeout = aiohttp.ClientTimeout(total=HELIUS_REQUEST_TIMEOUT, connect=HELIUS_CONNECT_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        self._flush_batch()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=False, cancel_futures=True)
+            self._decoder = None
+
+    async def _decode(self, raw: bytes):
+        """
+        Small responses are decoded inline; large ones in the decoder pool. orjson and json hold
+        the GIL while parsing, so only a process (HELIUS_DECODE_PROCESSES > 0) fully frees the loop.
+        """
+        if not HELIUS_DECODE_OFFLOAD_BYTES or len(raw) < HELIUS_DECODE_OFFLOAD_BYTES:
+            return decode_response(raw, HELIUS_PROJECT_ASSETS)
+
+        if self._decoder is None and HELIUS_DECODE_PROCESSES > 0:
+            # spawn: forking a process that runs aiosqlite and aiohttp threads is not safe
+            self._decoder = ProcessPoolExecutor(HELIUS_DECODE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        start = time.perf_counter()
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(self._decoder, decode_response, raw, HELIUS_PROJECT_ASSETS)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time.
+            logger.warning(f"Decoder process pool broke ({e}); decoding inline")
+            self._decoder = None
+            return decode_response(raw, HELIUS_PROJECT_ASSETS)
+        metrics.HELIUS_DECODE_SECONDS.observe(time.perf_counter() - start)
+        return data
+
+    async def _post(self, body, tokens: int = 1):
+        """
+        Sends one HTTP request carrying a JSON-RPC object or batch array and returns the decoded JSON.
+        429s, 5xx responses, timeouts and connection errors are retried with jittered exponential
+        backoff (or the server's Retry-After). Raises HeliusError once retries are exhausted,
+        the circuit breaker is open, or the request is rejected outright.
+        """
+        error = None
+        method = body.get("method", "unknown") if isinstance(body, dict) else "batch"
+        for attempt in range(HELIUS_MAX_RETRIES + 1):
+            if not self.breaker.allow_request():
+                raise HeliusError(f"Helius circuit breaker open ({error or 'recent failures'})")
+
+            await self.limiter.acquire(tokens)
+            start = time.perf_counter()
+            retry_after = None
+            status = "error"
+            try:
+                session = await self._get_session()
+                async with session.post(self.url, json=body) as response:
+                    status = response.status
+                    if response.status == 200:
+                        raw = await response.read()
+                        metrics.HELIUS_RESPONSE_BYTES.inc(len(raw), method=method)
+                        data = await self._decode(raw)
+                        self.breaker.record_success()
+                        return data
+
+                    text = await response.text()
+                    if response.status != 429 and response.status < 500:
+                        # The upstream is healthy; this request just won't succeed on retry.
+                        self.breaker.record_success()
+                        raise HeliusError(f"Helius API error: {response.status} - {text}")
+
+                    error = f"HTTP {response.status}"
+                    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.HELIUS_HTTP_REQUESTS.inc(method=method, status=status)
+                metrics.HELIUS_HTTP_SECONDS.observe(elapsed, method=method)
+                logger.debug(f"Helius request ({tokens} call(s)) took {elapsed * 1000:.1f}ms")
+
+            self.breaker.record_failure()
+            if attempt == HELIUS_MAX_RETRIES:
+                break
+
+            if retry_after is not None:
+                # Honour the server's hint, but never park a crawl page or a lookup for longer than a backoff.
+                delay = min(retry_after, HELIUS_BACKOFF_MAX)
+            else:
+                delay = _backoff(attempt)
+            reason = "transport" if status == "error" else "rate_limited" if status == 429 else "server_error"
+            metrics.HELIUS_RETRIES.inc(reason=reason)
+            logger.warning(f"Helius request failed ({error}); retry {attempt + 1}/{HELIUS_MAX_RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        raise HeliusError(f"Helius request failed after {HELIUS_MAX_RETRIES + 1} attempt(s): {error}")
+
+    @staticmethod
+    def _items(data, method: str) -> list:
+        if not isinstance(data, dict):
+            raise HeliusError(f"Helius returned no response for {method}")
+        if "result" in data:
+            return (data["result"] or {}).get("items", [])
+        raise HeliusError(f"Helius API error for {method}: {data.get('error', data)}")
+
+    async def _call(self, method: str, params: dict) -> list:
+        """
+        Issues a DAS call and returns its result items. Raises HeliusError on failure.
+        Concurrent calls are packed into JSON-RPC batches of up to HELIUS_MAX_BATCH_SIZE.
+        """
+        start = time.perf_counter()
+        try:
+            items = await self._send_call(method, params)
+        except Exception:
+            metrics.HELIUS_CALLS.inc(method=method, outcome="error")
+            raise
+        finally:
+            metrics.HELIUS_CALL_SECONDS.observe(time.perf_counter() - start, method=method)
+        metrics.HELIUS_CALLS.inc(method=method, outcome="ok")
+        metrics.HELIUS_ASSETS.inc(len(items), method=method)
+        return items
+
+    async def _exchange(self, payloads: list) -> dict:
+        """
+        Posts JSON-RPC calls (as a batch when there are several) and returns {id: response}.
+        An HTTP 200 can still carry per-entry errors: entries that failed transiently are
+        re-sent on their own, with the same backoff as _post(), until HELIUS_MAX_RETRIES.
+        """
+        responses = {}
+        pending = payloads
+        for attempt in range(HELIUS_MAX_RETRIES + 1):
+            if len(pending) == 1:
+                responses[pending[0]["id"]] = await self._post(pending[0])
+            else:
+                data = await self._post(pending, tokens=len(pending))
+                if not isinstance(data, list):
+                    raise HeliusError(f"Helius API error: {data}")
+                responses.update((item.get("id"), item) for item in data if isinstance(item, dict))
+
+            pending = [payload for payload in pending if _retryable_rpc_error(responses.get(payload["id"]))]
+            if not pending or attempt == HELIUS_MAX_RETRIES:
+                break
+            delay = _backoff(attempt)
+            item = responses.get(pending[0]["id"])
+            error = item.get("error") if isinstance(item, dict) else "no response"
+            metrics.HELIUS_RETRIES.inc(len(pending), reason="rpc_error")
+            logger.warning(f"{len(pending)} Helius call(s) failed ({error}); retry {attempt + 1}/{HELIUS_MAX_RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        return responses
+
+    async def _send_call(self, method: str, params: dict) -> list:
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        if HELIUS_MAX_BATCH_SIZE <= 1:
+            return self._items((await self._exchange([payload])).get(payload["id"]), method)
+
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((payload, future))
+        if len(self._batch) >= HELIUS_MAX_BATCH_SIZE:
+            self._flush_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(HELIUS_BATCH_WINDOW, self._flush_batch)
+        return await future
+
+    def _flush_batch(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.create_task(self._send_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch: list):
+        """
+        Posts a batch and routes each response (or error) back to its caller by id.
         """
-        payload = {
-            "jsonrpc": "2.0",
-            "id": "my-id",
-            "method": "getAssetsByGroup",
-            "params": {
-                "groupKey": "collection",
-                "groupValue": collection_address,
-                "page": page,
-                "limit": limit
-            }
-        }
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.url, json=payload) as response:
-                    if response.status != 200:
-                        logger.error(f"Helius API error: {response.status} - {await response.text()}")
-                        return []
-                    
-                    data = await response.json()
-                    if "result" in data:
-                         return data["result"].get("items", [])
-                    else:
-                        logger.error(f"Helius API error: {data}")
-                        return []
+            responses = await self._exchange([payload for payload, _ in batch])
+            for payload, future in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(self._items(responses.get(payload["id"]), payload["method"]))
+                except HeliusError as e:
+                    future.set_exception(e)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
         except Exception as e:
-            logger.exception(f"Exception calling Helius API: {e}")
-            return []
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def get_assets_by_group(self, collection_address: str, page: int = 1, limit: int = 1000, sort_by: Optional[str] = None):
+        """
+        Fetches assets for a specific collection (group).
+        sort_by: optional DAS sort key ("created", "updated", "recent_action"), newest first.
+        """
+        params = {
+            "groupKey": "collection",
+            "groupValue": collection_address,
+            "page": page,
+            "limit": limit
+        }
+        if sort_by:
+            params["sortBy"] = {"sortBy": sort_by, "sortDirection": "desc"}
+        return await self._call("getAssetsByGroup", params)
 
     async def get_assets_by_owner(self, owner_address: str, page: int = 1, limit: int = 1000):
-         payload = {
-            "jsonrpc": "2.0",
-            "id": "my-id",
-            "method": "getAssetsByOwner",
-            "params": {
-                "ownerAddress": owner_address,
-                "page": page,
-                "limit": limit,
-                 "displayOptions": {
-                    "showUnverifiedCollections": False,
-                    "showCollectionMetadata": True
-                }
+        params = {
+            "ownerAddress": owner_address,
+            "page": page,
+            "limit": limit,
+            "displayOptions": {
+                "showUnverifiedCollections": False,
+                "showCollectionMetadata": True
             }
         }
-         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.url, json=payload) as response:
-                    if response.status != 200:
-                         logger.error(f"Helius API error: {response.status} - {await response.text()}")
-                         return []
-                    
-                    data = await response.json()
-                    if "result" in data:
-                         return data["result"].get("items", [])
-                    else:
-                         logger.error(f"Helius API error: {data}")
-                         return []
-         except Exception as e:
-            logger.exception(f"Exception calling Helius API: {e}")
-            return []
+        return await self._call("getAssetsByOwner", params)
 
-    async def get_all_assets_by_owner(self, owner_address: str):
+    async def search_assets_by_owner_in_collection(self, owner_address: str, collection_address: str, page: int = 1, limit: int = 1000):
         """
-        Fetches all assets for a given owner, handling pagination.
+        Fetches only the assets an owner holds in one collection.
+        """
+        params = {
+            "ownerAddress": owner_address,
+            "grouping": ["collection", collection_address],
+            "page": page,
+            "limit": limit
+        }
+        return await self._call("searchAssets", params)
+
+    async def _iter_pages(self, fetch_page, label: str, log_level: int = logging.INFO) -> AsyncIterator[list]:
+        """
+        Pages through a DAS listing, yielding one page of items at a time. After the first
+        page, up to HELIUS_PAGE_CONCURRENCY pages are requested at once (the window doubles
+        each round); the rate limiter decides how fast they actually go out. Stops at the
+        first empty or short page. At most one window of pages is held in memory.
+        A failed page raises HeliusError instead of silently ending the listing.
         """
-        all_assets = []
         page = 1
         limit = 1000
-        
+        window = 1
+        requests = 0
+        total = 0
+        start = time.perf_counter()
+
         while True:
-            assets = await self.get_assets_by_owner(owner_address, page, limit)
-            if not assets:
-                break
-            
-            all_assets.extend(assets)
-            
-            if len(assets) < limit:
+            pages = await asyncio.gather(*(fetch_page(p, limit) for p in range(page, page + window)))
+            requests += window
+
+            done = False
+            for i, assets in enumerate(pages):
+                # Drop our reference before yielding so consumed pages can be freed.
+                pages[i] = None
+                if not assets:
+                    done = True
+                    break
+
+                total += len(assets)
+                yield assets
+
+                if len(assets) < limit:
+                    done = True
+                    break
+
+            if done:
                 break
-                
-            page += 1
-            await asyncio.sleep(HELIUS_RATE_LIMIT_DELAY) # Rate limiting
-            
-        return all_assets
+
+            page += window
+            window = min(window * 2, HELIUS_PAGE_CONCURRENCY)
+
+        logger.log(log_level, f"Fetched {total} assets for {label} with {requests} request(s) in {time.perf_counter() - start:.2f}s")
+
+    def iter_assets_by_owner(self, owner_address: str) -> AsyncIterator[list]:
+        """
+        Streams an owner's assets page by page.
+        """
+        return self._iter_pages(
+            lambda page, limit: self.get_assets_by_owner(owner_address, page, limit),
+            f"owner {owner_address}"
+        )
+
+    def iter_assets_by_group(self, collection_address: str) -> AsyncIterator[list]:
+        """
+        Streams a collection's (group's) assets page by page.
+        """
+        return self._iter_pages(
+            lambda page, limit: self.get_assets_by_group(collection_address, page, limit),
+            f"collection {collection_address}"
+        )
+
+    def iter_assets_by_owner_in_collection(self, owner_address: str, collection_address: str) -> AsyncIterator[list]:
+        """
+        Streams an owner's assets within a single collection page by page.
+        """
+        return self._iter_pages(
+            lambda page, limit: self.search_assets_by_owner_in_collection(owner_address, collection_address, page, limit),
+            f"owner {owner_address} in collection {collection_address}",
+            logging.DEBUG
+        )
+
+    async def get_all_assets_by_owner(self, owner_address: str):
+        """
+        Fetches all assets for a given owner, handling pagination.
+        """
+        return [asset async for page in self.iter_assets_by_owner(owner_address) for asset in page]
 
     async def get_all_assets_by_group(self, collection_address: str):
         """
         Fetches all assets for a given collection (group), handling pagination.
+        Prefer iter_assets_by_group() for large collections.
         """
-        all_assets = []
-        page = 1
-        limit = 1000
-        
-        while True:
-            assets = await self.get_assets_by_group(collection_address, page, limit)
-            if not assets:
-                break
-            
-            all_assets.extend(assets)
-            
-            if len(assets) < limit:
-                break
-                
-            page += 1
-            await asyncio.sleep(HELIUS_RATE_LIMIT_DELAY) # Rate limiting
-            
-        return all_assets
+        return [asset async for page in self.iter_assets_by_group(collection_address) for asset in page]
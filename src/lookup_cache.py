@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class SingleFlightCache:
+    """
+    Bounded LRU of recent lookup results with a short TTL, plus single-flight: concurrent
+    misses for the same key share one fetch instead of each starting their own.
+    Failed fetches are not cached. `name` labels the hit/miss/coalesced metrics.
+    """
+    def __init__(self, maxsize: int, ttl: float, name: str):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        metrics.LOOKUP_CACHE_ENTRIES.set_function(lambda: len(self._entries), cache=name)
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        """
+        Returns the cached value for `key`, joins an in-flight fetch for it, or starts `fetch()`.
+        A caller being cancelled does not cancel the fetch the others are waiting on.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.LOOKUP_CACHE.inc(cache=self.name, outcome="hit")
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            metrics.LOOKUP_CACHE.inc(cache=self.name, outcome="coalesced")
+        else:
+            self.misses += 1
+            metrics.LOOKUP_CACHE.inc(cache=self.name, outcome="miss")
+            task = asyncio.get_running_loop().create_task(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    def _settle(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is not task:
+            return  # superseded by put() or invalidate() while in flight
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def put(self, key: Hashable, value):
+        """
+        Stores a fresh value (e.g. from a webhook refresh); an older in-flight fetch won't overwrite it.
+        """
+        self._inflight.pop(key, None)
+        if not self.maxsize:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Returns: {"entries", "hits", "misses", "coalesced", "hit_rate"}
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,262 @@
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Tuple
+from aiohttp import web
+from .config import METRICS_HOST, METRICS_PORT, METRICS_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self):
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    """
+    Set directly, or bound to a callback that is read at scrape time.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels):
+        self._functions[self._key(labels)] = function
+
+    def _samples(self):
+        values = dict(self._values)
+        for key, function in self._functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], list] = {}  # per-bucket (non-cumulative) counts, +Inf last
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self):
+        lines = []
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self._counts[key]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class _Timer:
+    """
+    Context manager that observes the elapsed wall time into a histogram.
+    """
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format (0.0.4).
+        """
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = Registry()
+
+# --- Helius DAS ---
+
+HELIUS_HTTP_REQUESTS = Counter("osv_helius_http_requests_total", "HTTP requests sent to Helius, by JSON-RPC method ('batch' for batches) and status code.", ("method", "status"))
+HELIUS_HTTP_SECONDS = Histogram("osv_helius_http_request_seconds", "Latency of HTTP requests to Helius.", ("method",))
+HELIUS_RESPONSE_BYTES = Counter("osv_helius_response_bytes_total", "Response body bytes received from Helius.", ("method",))
+HELIUS_RETRIES = Counter("osv_helius_retries_total", "Helius requests (or calls within a batch) retried after a 429, 5xx, transport or transient JSON-RPC error.", ("reason",))
+HELIUS_CALLS = Counter("osv_helius_calls_total", "DAS calls (one per page), by method and outcome.", ("method", "outcome"))
+HELIUS_CALL_SECONDS = Histogram("osv_helius_call_seconds", "Latency of DAS calls including batching and retries.", ("method",))
+HELIUS_ASSETS = Counter("osv_helius_assets_total", "Assets returned by DAS calls.", ("method",))
+HELIUS_DECODE_SECONDS = Histogram("osv_helius_offloaded_decode_seconds", "Time to decode a large Helius response off the event loop, including the hand-off.")
+HELIUS_BREAKER_OPEN = Gauge("osv_helius_circuit_open", "1 while the Helius circuit breaker is open or half-open.")
+
+# --- Database ---
+
+DB_OPERATION_SECONDS = Histogram("osv_db_operation_seconds", "Latency of Database methods.", ("operation",))
+DB_OPERATION_ERRORS = Counter("osv_db_operation_errors_total", "Database method calls that raised.", ("operation",))
+
+# --- Role sync ---
+
+SYNC_PHASE_SECONDS = Histogram("osv_sync_phase_seconds", "Duration of each role sync phase (crawl, resolve_users, calculate_roles, discord_mutations).", ("phase",))
+SYNC_PASS_SECONDS = Histogram("osv_sync_pass_seconds", "Duration of a whole role sync pass.", ("mode",))
+SYNC_PASSES = Counter("osv_sync_passes_total", "Role sync passes, by outcome (full, incremental, skipped, error).", ("outcome",))
+SYNC_MEMBERS_EVALUATED = Gauge("osv_sync_members_evaluated", "Members evaluated by the last sync pass.")
+SYNC_LAST_SUCCESS = Gauge("osv_sync_last_success_timestamp_seconds", "Unix time the last sync pass completed.")
+SYNC_INCOMPLETE_COLLECTIONS = Gauge("osv_sync_incomplete_collections", "Collections whose latest crawl failed part-way.")
+SNAPSHOT_VERSION = Gauge("osv_snapshot_version", "Holdings snapshot version last applied by this shard process.")
+CRAWL_FINGERPRINTS = Counter("osv_crawl_fingerprints_total", "Collection fingerprint pre-checks, by outcome (unchanged, changed, expired, error).", ("outcome",))
+
+# --- Discord role mutations ---
+
+ROLE_EDITS = Counter("osv_role_edits_total", "Queued role mutations, by outcome (applied, skipped, failed, rate_limited).", ("outcome",))
+ROLE_EDIT_SECONDS = Histogram("osv_role_edit_seconds", "Latency of member.edit() calls.")
+ROLE_QUEUE_DEPTH = Gauge("osv_role_queue_depth", "Members waiting for a role edit.")
+ROLE_DRAIN_RATE = Gauge("osv_role_drain_rate", "Role edits applied per second over the last minute.")
+
+# --- Lookup caches ---
+
+LOOKUP_CACHE = Counter("osv_lookup_cache_total", "Cached lookups by cache and outcome (hit, miss, coalesced onto an in-flight fetch).", ("cache", "outcome"))
+LOOKUP_CACHE_ENTRIES = Gauge("osv_lookup_cache_entries", "Entries held by each lookup cache.", ("cache",))
+
+# --- Startup ---
+
+STARTUP_PHASE_SECONDS = Gauge("osv_startup_phase_seconds", "Duration of each start-up phase (imports, setup_hook, holdings warm-up, gateway ready).", ("phase",))
+
+# --- Verification ---
+
+CHALLENGES_PENDING = Gauge("osv_challenges_pending", "Verification challenges held in memory.")
+CHALLENGES_EXPIRED = Counter("osv_challenges_expired_total", "Challenges that expired unused, swept from memory.")
+VERIFICATIONS = Counter("osv_verifications_total", "Wallet verification attempts, by source (signature, watcher) and outcome.", ("source", "outcome"))
+
+def timed(histogram: Histogram, errors: Optional[Counter] = None, label: str = "operation"):
+    """
+    Decorator for coroutine methods: observes their duration under `label`=<function name>
+    and counts calls that raise.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                if errors is not None:
+                    errors.inc(**{label: name})
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, **{label: name})
+        return wrapper
+    return decorator
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving REGISTRY in the Prometheus text format.
+    """
+    def __init__(self):
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(METRICS_PATH, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, METRICS_HOST, METRICS_PORT).start()
+        logger.info(f"Metrics endpoint listening on http://{METRICS_HOST}:{METRICS_PORT}{METRICS_PATH}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=REGISTRY.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Async token-bucket limiter: refills at `rate` tokens per second up to `burst`.
+    Waiters are served in arrival order.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int = 1):
+        """
+        Waits until `tokens` can be taken. Requests larger than the burst wait for a
+        full bucket and then run the balance negative, so later callers pay the difference.
+        """
+        needed = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < needed:
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
@@ -0,0 +1,120 @@
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from .config import COLLECTION_REFRESH_MIN_SECONDS, COLLECTION_REFRESH_MAX_SECONDS, COLLECTION_REFRESH_TARGET_CHANGES
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest churn sample in the moving average.
+CHURN_SMOOTHING = 0.5
+
+@dataclass
+class CollectionChurn:
+    rate: Optional[float] = None  # ownership changes per second, smoothed
+    last_crawl: Optional[float] = None
+    interval: float = 0.0
+    next_due: float = 0.0
+
+class CollectionRefreshScheduler:
+    """
+    Decides which collections to re-crawl. Each crawl reports how many ownership changes it
+    found; the smoothed change rate sets the next interval so a crawl finds about
+    COLLECTION_REFRESH_TARGET_CHANGES changes, bounded by the configured min/max.
+    Next-due times live in a heap, so checking for due collections costs O(due log n).
+    """
+    def __init__(self, min_interval: float = COLLECTION_REFRESH_MIN_SECONDS, max_interval: float = COLLECTION_REFRESH_MAX_SECONDS,
+                 target_changes: float = COLLECTION_REFRESH_TARGET_CHANGES):
+        self.min_interval = max(0.0, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.target_changes = max(1.0, target_changes)
+        self.collections: Dict[str, CollectionChurn] = {}
+        self._heap = []  # (next_due, collection); stale entries are skipped lazily
+
+    def _schedule(self, coll_addr: str, due: float):
+        state = self.collections[coll_addr]
+        state.next_due = due
+        heapq.heappush(self._heap, (due, coll_addr))
+
+    def seed(self, last_updated: Dict[str, float]):
+        """
+        Starts tracking collections restored from the holdings cache: each is due one
+        minimum interval after its last persisted crawl.
+        """
+        for coll_addr, updated_at in last_updated.items():
+            if coll_addr not in self.collections:
+                self.collections[coll_addr] = CollectionChurn(last_crawl=updated_at)
+                self._schedule(coll_addr, updated_at + self.min_interval)
+
+    def due(self, tracked: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """
+        Returns the tracked collections whose refresh is due. Never-seen collections are due
+        immediately; untracked ones are forgotten.
+        """
+        now = time.time() if now is None else now
+        tracked = set(tracked)
+        for coll_addr in list(self.collections):
+            if coll_addr not in tracked:
+                del self.collections[coll_addr]
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, coll_addr = heapq.heappop(self._heap)
+            state = self.collections.get(coll_addr)
+            if state is not None and state.next_due == when:  # else forgotten or rescheduled since
+                due.append(coll_addr)
+        due.extend(coll_addr for coll_addr in tracked if coll_addr not in self.collections)
+
+        for coll_addr in due:
+            # Keep it scheduled until the crawl reports back, so a lost crawl is retried.
+            self.collections.setdefault(coll_addr, CollectionChurn())
+            self._schedule(coll_addr, now + self.min_interval)
+        return due
+
+    def record_crawl(self, coll_addr: str, changes: int, now: Optional[float] = None):
+        """
+        Feeds the ownership changes found by a complete crawl and schedules the next one.
+        """
+        now = time.time() if now is None else now
+        state = self.collections.setdefault(coll_addr, CollectionChurn())
+
+        if state.last_crawl is not None and now > state.last_crawl:
+            sample = changes / (now - state.last_crawl)
+            state.rate = sample if state.rate is None else CHURN_SMOOTHING * sample + (1 - CHURN_SMOOTHING) * state.rate
+        state.last_crawl = now
+
+        if not state.rate:
+            # Nothing moved (or no baseline yet): back off geometrically towards the max.
+            interval = max(state.interval, self.min_interval) * 2 if changes == 0 and state.rate is not None else self.min_interval
+        else:
+            interval = self.target_changes / state.rate
+        state.interval = min(self.max_interval, max(self.min_interval, interval))
+        self._schedule(coll_addr, now + state.interval)
+        logger.debug(f"Collection {coll_addr}: {changes} change(s), next crawl in {state.interval:.0f}s")
+
+    def record_failure(self, coll_addr: str, now: Optional[float] = None):
+        """
+        An incomplete crawl is retried after the minimum interval.
+        """
+        now = time.time() if now is None else now
+        self.collections.setdefault(coll_addr, CollectionChurn())
+        self._schedule(coll_addr, now + self.min_interval)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            when, coll_addr = self._heap[0]
+            state = self.collections.get(coll_addr)
+            if state is not None and state.next_due == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    def stats(self) -> dict:
+        """
+        Returns: {collection: {"interval": seconds, "rate": changes per second, "next_due": unix time}}
+        """
+        return {
+            coll_addr: {"interval": state.interval, "rate": state.rate or 0.0, "next_due": state.next_due}
+            for coll_addr, state in self.collections.items()
+        }
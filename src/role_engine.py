@@ -1,90 +1,520 @@
+import asyncio
+import functools
+import hashlib
 import logging
-from typing import Set, Tuple, Optional
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, FrozenSet, Mapping, Set, Tuple, Optional
+from .config import (
+    HELIUS_COLLECTION_CONCURRENCY, HOLDINGS_CACHE_TTL, WALLET_LOOKUP_CACHE_SIZE, WALLET_LOOKUP_CACHE_TTL,
+    CRAWL_FINGERPRINT_ENABLED, CRAWL_FINGERPRINT_SIZE, CRAWL_FINGERPRINT_MAX_AGE_SECONDS
+)
 from .db import Database
-from .helius_client import HeliusClient
+from .helius_client import HeliusClient, HeliusError
+from .lookup_cache import SingleFlightCache
+from .refresh_scheduler import CollectionRefreshScheduler
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
+# Below this many wallets the per-wallet path beats building matrices.
+BULK_MIN_WALLETS = 32
+
+# DAS page size. An owner whose first getAssetsByOwner page is shorter than this has been listed in full.
+OWNER_PAGE_LIMIT = 1000
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """
+    NumPy, imported on the first bulk evaluation rather than at startup; None if not installed.
+    """
+    try:
+        import numpy
+    except ImportError:  # Optional: bulk evaluation falls back to the per-wallet path
+        return None
+    return numpy
+
+@dataclass(frozen=True)
+class CollectionTiers:
+    """
+    Tiers of one collection, sorted by ascending threshold.
+    """
+    thresholds: Tuple[int, ...]
+    role_ids: Tuple[int, ...]
+
+    def highest_role(self, count: int) -> Optional[int]:
+        idx = bisect_right(self.thresholds, count) - 1
+        return self.role_ids[idx] if idx >= 0 else None
+
+@dataclass(frozen=True)
+class TierTable:
+    """
+    Immutable, pre-compiled view of every tracked collection's tiers.
+    """
+    collections: Mapping[str, CollectionTiers]
+    managed_roles: FrozenSet[int]
+
+    @classmethod
+    def compile(cls, tier_rows) -> "TierTable":
+        """
+        tier_rows: iterable of (id, collection_address, min_amount, role_id)
+        """
+        grouped = {}
+        for tier_id, coll_addr, min_amount, role_id in tier_rows:
+            grouped.setdefault(coll_addr, []).append((min_amount, -tier_id, role_id))
+
+        collections = {}
+        for coll_addr, tiers in grouped.items():
+            # On equal thresholds the oldest tier sorts last, so it wins the bisect (matches the old DESC scan).
+            tiers.sort()
+            collections[coll_addr] = CollectionTiers(
+                thresholds=tuple(t[0] for t in tiers),
+                role_ids=tuple(t[2] for t in tiers),
+            )
+
+        managed_roles = frozenset(rid for tiers in collections.values() for rid in tiers.role_ids)
+        return cls(collections=MappingProxyType(collections), managed_roles=managed_roles)
+
+    def roles_for(self, user_holdings: dict) -> Tuple[Set[int], Set[int]]:
+        roles_to_add = set()
+        for coll_addr, tiers in self.collections.items():
+            role_id = tiers.highest_role(user_holdings.get(coll_addr, 0))
+            if role_id is not None:
+                roles_to_add.add(role_id)
+
+        return roles_to_add, set(self.managed_roles - roles_to_add)
+
+    def bulk_roles(self, holdings: Mapping[str, dict]) -> Dict[str, FrozenSet[int]]:
+        """
+        Desired managed roles for many wallets in one vectorized pass (NumPy, when installed).
+        holdings: {wallet: {collection_address: count}}
+        Returns: {wallet: frozenset(role_ids)}
+        """
+        np = _numpy() if len(holdings) >= BULK_MIN_WALLETS and self.collections else None
+        if np is None:
+            return {wallet: frozenset(self.roles_for(colls)[0]) for wallet, colls in holdings.items()}
+
+        # Wallet x collection count matrix; untracked collections land in a trailing sink column.
+        columns = {coll_addr: col for col, coll_addr in enumerate(self.collections)}
+        sink = len(columns)
+        per_wallet = list(holdings.values())
+        rows = np.repeat(np.arange(len(per_wallet)), [len(colls) for colls in per_wallet])
+        cols = [columns.get(coll_addr, sink) for colls in per_wallet for coll_addr in colls]
+        values = [count for colls in per_wallet for count in colls.values()]
+        counts = np.zeros((len(per_wallet), sink + 1), dtype=np.int64)
+        counts[rows, cols] = values
+        counts = counts[:, :sink]
+
+        # Collection x tier thresholds, padded so missing tiers are never reached; role column 0 means "none".
+        depth = max(len(tiers.thresholds) for tiers in self.collections.values())
+        thresholds = np.full((sink, depth), np.iinfo(np.int64).max, dtype=np.int64)
+        role_ids = np.zeros((sink, depth + 1), dtype=np.int64)
+        for col, tiers in enumerate(self.collections.values()):
+            thresholds[col, :len(tiers.thresholds)] = tiers.thresholds
+            role_ids[col, 1:len(tiers.role_ids) + 1] = tiers.role_ids
+
+        # Thresholds reached == bisect_right(thresholds, count), i.e. the highest tier's index + 1.
+        reached = np.zeros(counts.shape, dtype=np.int64)
+        for k in range(depth):
+            reached += counts >= thresholds[:, k]
+        roles = role_ids[np.arange(sink)[None, :], reached]
+
+        # The matrix is sparse: only walk the wallets' qualifying roles back into Python.
+        desired = [[] for _ in per_wallet]
+        wallet_rows, role_cols = np.nonzero(roles)
+        for row, role_id in zip(wallet_rows.tolist(), roles[wallet_rows, role_cols].tolist()):
+            desired[row].append(role_id)
+        return {wallet: frozenset(role_set) for wallet, role_set in zip(holdings, desired)}
+
+    def without(self, collections) -> "TierTable":
+        """
+        The table with these collections' tiers left out. Their roles are no longer managed
+        (never added or removed), even where another collection's tier grants the same role.
+        """
+        masked = set(collections).intersection(self.collections)
+        if not masked:
+            return self
+        kept = {coll_addr: tiers for coll_addr, tiers in self.collections.items() if coll_addr not in masked}
+        masked_roles = {rid for coll_addr in masked for rid in self.collections[coll_addr].role_ids}
+        managed_roles = frozenset(rid for tiers in kept.values() for rid in tiers.role_ids) - masked_roles
+        return TierTable(collections=MappingProxyType(kept), managed_roles=managed_roles)
+
+@dataclass
+class CrawlResult:
+    """
+    Outcome of crawling one collection. `counts` is only trustworthy when `complete`.
+    """
+    collection: str
+    counts: dict
+    complete: bool
+    error: Optional[str] = None
+    fingerprint: Optional[str] = None
+    unchanged: bool = False  # fingerprint matched; `counts` is empty and the snapshot still holds
+
+def collection_fingerprint(assets: list) -> str:
+    """
+    Hash of (asset id, owner, burnt) over a page of a collection's most recently active assets.
+    Any transfer, mint or burn moves an asset to the front, so the hash changes with it.
+    """
+    digest = hashlib.sha1()
+    for asset in assets:
+        owner = asset.get("ownership", {}).get("owner")
+        digest.update(f"{asset.get('id')}:{owner}:{int(bool(asset.get('burnt')))};".encode())
+    return digest.hexdigest()
+
+async def aggregate_owner_counts(pages: AsyncIterator[list]) -> dict:
+    """
+    Reduces a stream of DAS asset pages to {owner: count}, keeping nothing else.
+    """
+    counts = {}
+    async for assets in pages:
+        for asset in assets:
+            owner = asset.get("ownership", {}).get("owner")
+            if owner:
+                counts[owner] = counts.get(owner, 0) + 1
+    return counts
+
+def count_by_collection(assets, collections) -> dict:
+    """
+    Reduces one owner's assets to {collection_address: count} for the given collections.
+    """
+    counts = {}
+    for asset in assets:
+        for group in asset.get("grouping") or []:
+            if group.get("group_key") == "collection" and group.get("group_value") in collections:
+                counts[group["group_value"]] = counts.get(group["group_value"], 0) + 1
+    return counts
+
+def diff_holdings(old: dict, new: dict) -> Tuple[list, list]:
+    """
+    Compares two {wallet: {collection: count}} maps.
+    Returns: ([(wallet, collection, count)] to upsert, [(wallet, collection)] to delete)
+    """
+    upserts = []
+    deletes = []
+    for wallet, colls in new.items():
+        prev = old.get(wallet)
+        if prev == colls:
+            continue
+        prev = prev or {}
+        for coll_addr, count in colls.items():
+            if prev.get(coll_addr) != count:
+                upserts.append((wallet, coll_addr, count))
+        for coll_addr in prev:
+            if coll_addr not in colls:
+                deletes.append((wallet, coll_addr))
+
+    for wallet, prev in old.items():
+        if wallet not in new:
+            deletes.extend((wallet, coll_addr) for coll_addr in prev)
+
+    return upserts, deletes
+
 class RoleEngine:
     def __init__(self, db: Database, helius: HeliusClient):
         self.db = db
         self.helius = helius
+        self._tier_table: Optional[TierTable] = None
+        self._tier_table_version = -1
+        # Last completed global holdings snapshot, mirrored in nft_cache.
+        self.holdings = {}
+        self.holdings_updated_at = {}  # collection_address -> unix time of its last crawl
+        self.incomplete_collections = set()  # collections whose latest crawl failed part-way
+        self.refresh_scheduler = CollectionRefreshScheduler()
+        self.last_refreshed = []  # collections crawled completely by the latest get_global_holdings()
+        self.fingerprints = {}  # collection_address -> (fingerprint, unix time of its last full crawl)
+        # Live (wallet, collection) -> count lookups; concurrent verifications of one wallet share a fetch.
+        self.wallet_lookups = SingleFlightCache(WALLET_LOOKUP_CACHE_SIZE, WALLET_LOOKUP_CACHE_TTL, "wallet_holdings")
+
+    async def load_cached_holdings(self):
+        """
+        Restores the last persisted snapshot so lookups work before the first crawl finishes.
+        """
+        self.holdings, self.holdings_updated_at = await self.db.load_holdings_snapshot()
+        self.fingerprints = await self.db.load_collection_fingerprints()
+        self.refresh_scheduler.seed(self.holdings_updated_at)
+        logger.info(f"Loaded cached holdings for {len(self.holdings)} wallets across {len(self.holdings_updated_at)} collections")
+
+    async def _store_snapshot(self, holdings: dict, refreshed: list, tracked: list, fingerprints: Optional[dict] = None):
+        """
+        Persists only the rows that changed since the previous snapshot, in one transaction.
+        refreshed: collections crawled completely this time (their timestamps move forward)
+        tracked: every tracked collection (others keep the time of their last good crawl)
+        fingerprints: {collection: (fingerprint, crawled_at)} to persist with the snapshot
+        """
+        upserts, deletes = diff_holdings(self.holdings, holdings)
+        now = time.time()
+        try:
+            await self.db.save_holdings_changes(upserts, deletes, refreshed, now, fingerprints)
+        except Exception as e:
+            # Keep the old in-memory base so the next diff still matches what is on disk.
+            logger.exception(f"Failed to persist holdings snapshot: {e}")
+            return
+
+        previous_updated_at = self.holdings_updated_at
+        refreshed = set(refreshed)
+        self.holdings = holdings
+        self.fingerprints.update(fingerprints or {})
+        self.holdings_updated_at = {
+            coll_addr: now if coll_addr in refreshed else previous_updated_at[coll_addr]
+            for coll_addr in tracked
+            if coll_addr in refreshed or coll_addr in previous_updated_at
+        }
+        logger.info(f"Persisted holdings snapshot: {len(upserts)} upserted, {len(deletes)} deleted rows")
+
+    async def get_tier_table(self) -> TierTable:
+        """
+        Returns the compiled tier table, recompiling only after collections or tiers changed.
+        """
+        version = self.db.tiers_version
+        if self._tier_table is None or self._tier_table_version != version:
+            rows = await self.db.get_tracked_tiers()
+            self._tier_table = TierTable.compile(rows)
+            self._tier_table_version = version
+            logger.info(
+                f"Compiled tier table: {len(self._tier_table.collections)} collections, "
+                f"{len(self._tier_table.managed_roles)} managed roles"
+            )
+        return self._tier_table
+
+    async def _fingerprint(self, coll_addr: str) -> Optional[str]:
+        """
+        One-page probe of the collection's most recently active assets.
+        Returns None when the probe fails, which forces a full crawl.
+        """
+        try:
+            assets = await self.helius.get_assets_by_group(coll_addr, 1, CRAWL_FINGERPRINT_SIZE, sort_by="recent_action")
+        except Exception as e:
+            metrics.CRAWL_FINGERPRINTS.inc(outcome="error")
+            logger.warning(f"Fingerprint probe for collection {coll_addr} failed, crawling it fully: {e}")
+            return None
+        return collection_fingerprint(assets)
+
+    def _is_unchanged(self, coll_addr: str, fingerprint: Optional[str]) -> bool:
+        stored = self.fingerprints.get(coll_addr)
+        if fingerprint is None or stored is None or not self.has_snapshot(coll_addr):
+            return False
+        if stored[0] != fingerprint:
+            metrics.CRAWL_FINGERPRINTS.inc(outcome="changed")
+            return False
+        # Belt and braces: re-crawl now and then even if the probe keeps matching.
+        if time.time() - (stored[1] or 0) >= CRAWL_FINGERPRINT_MAX_AGE_SECONDS:
+            metrics.CRAWL_FINGERPRINTS.inc(outcome="expired")
+            return False
+        metrics.CRAWL_FINGERPRINTS.inc(outcome="unchanged")
+        return True
+
+    async def _crawl_collection(self, coll_addr: str, semaphore: asyncio.Semaphore) -> CrawlResult:
+        async with semaphore:
+            # Probe before paging: a transfer that lands mid-crawl then changes the next probe.
+            fingerprint = await self._fingerprint(coll_addr) if CRAWL_FINGERPRINT_ENABLED else None
+            if self._is_unchanged(coll_addr, fingerprint):
+                logger.info(f"Collection {coll_addr} unchanged since its last crawl, skipping")
+                return CrawlResult(coll_addr, {}, complete=True, fingerprint=fingerprint, unchanged=True)
+
+            logger.info(f"Fetching all assets for collection: {coll_addr}")
+            try:
+                counts = await aggregate_owner_counts(self.helius.iter_assets_by_group(coll_addr))
+            except Exception as e:
+                logger.warning(f"Crawl of collection {coll_addr} incomplete: {e}")
+                return CrawlResult(coll_addr, {}, complete=False, error=str(e))
+            return CrawlResult(coll_addr, counts, complete=True, fingerprint=fingerprint)
+
+    def _snapshot_counts(self, collections: set) -> dict:
+        """
+        Returns: {collection_address: {owner: count}} from the current snapshot.
+        """
+        counts = {coll_addr: {} for coll_addr in collections}
+        for wallet, colls in self.holdings.items():
+            for coll_addr in collections.intersection(colls):
+                counts[coll_addr][wallet] = colls[coll_addr]
+        return counts
 
     async def get_global_holdings(self) -> dict:
         """
-        Fetches all assets for all tracked collections and builds a global holdings map.
+        Re-crawls the collections the refresh scheduler says are due and merges them with
+        the last snapshot of the others. Due collections whose fingerprint still matches the
+        stored one are not paged at all. Due collections are crawled concurrently; the Helius
+        client's rate limiter paces requests. A collection whose crawl fails part-way keeps
+        its last good snapshot and is listed in `incomplete_collections`, so partial data
+        never removes roles.
         Returns: {wallet_address: {collection_address: count}}
         """
-        collections = await self.db.get_all_collections()
+        collections = [row[0] for row in await self.db.get_all_collections()]
+        due = self.refresh_scheduler.due(collections)
+        if not due:
+            self.last_refreshed = []
+            return self.holdings
+
+        semaphore = asyncio.Semaphore(max(1, HELIUS_COLLECTION_CONCURRENCY))
+        results = await asyncio.gather(*(self._crawl_collection(coll_addr, semaphore) for coll_addr in due))
+        previous = self._snapshot_counts(set(collections))
+        crawled = {
+            result.collection: previous[result.collection] if result.unchanged else result.counts
+            for result in results if result.complete
+        }
+        unchanged = {result.collection for result in results if result.unchanged}
+        incomplete = {result.collection for result in results if not result.complete}
+
         global_holdings = {} # wallet_address -> {collection_address: count}
-        
-        for coll_row in collections:
-            coll_addr = coll_row[0]
-            logger.info(f"Fetching all assets for collection: {coll_addr}")
-            assets = await self.helius.get_all_assets_by_group(coll_addr)
-            
-            for asset in assets:
-                owner = asset.get("ownership", {}).get("owner")
-                if not owner:
-                    continue
-                
-                if owner not in global_holdings:
-                    global_holdings[owner] = {}
-                
-                global_holdings[owner][coll_addr] = global_holdings[owner].get(coll_addr, 0) + 1
-                
+        for coll_addr in collections:
+            counts = crawled.get(coll_addr, previous[coll_addr])
+            for owner, count in counts.items():
+                global_holdings.setdefault(owner, {})[coll_addr] = count
+
+        now = time.time()
+        fingerprints = {
+            result.collection: (result.fingerprint, self.fingerprints[result.collection][1] if result.unchanged else now)
+            for result in results if result.complete
+        }
+        for coll_addr, counts in crawled.items():
+            old = previous[coll_addr]
+            moved = sum(abs(counts.get(owner, 0) - old.get(owner, 0)) for owner in old.keys() | counts.keys())
+            # Each transfer shows up twice: once as a loss, once as a gain.
+            self.refresh_scheduler.record_crawl(coll_addr, (moved + 1) // 2, now)
+        for coll_addr in incomplete:
+            self.refresh_scheduler.record_failure(coll_addr, now)
+
+        if incomplete:
+            logger.warning(f"Reusing last good snapshot for {len(incomplete)} incomplete collection(s): {', '.join(sorted(incomplete))}")
+        self.incomplete_collections = ((self.incomplete_collections - crawled.keys()) | incomplete).intersection(collections)
+        # Unchanged collections are confirmed current but have nothing new to sync.
+        self.last_refreshed = [coll_addr for coll_addr in crawled if coll_addr not in unchanged]
+        logger.info(
+            f"Crawled {len(crawled) - len(unchanged)} of {len(collections)} collection(s); "
+            f"{len(unchanged)} unchanged, {len(collections) - len(due)} not due yet"
+        )
+
+        await self._store_snapshot(global_holdings, list(crawled), collections, fingerprints)
         return global_holdings
 
+    def has_snapshot(self, coll_addr: str) -> bool:
+        """
+        True once the collection has been crawled completely at least once.
+        """
+        return coll_addr in self.holdings_updated_at
+
+    async def _count_owned(self, wallet_address: str, coll_addr: str) -> int:
+        count = 0
+        async for assets in self.helius.iter_assets_by_owner_in_collection(wallet_address, coll_addr):
+            count += len(assets)
+        return count
+
+    async def _fetch_wallet_holdings(self, wallet_address: str, collections) -> dict:
+        """
+        Returns: {collection_address: count} for one owner in the given collections.
+        One getAssetsByOwner page answers for most wallets however many collections are
+        tracked. Owners who fill that page (whales) are counted with one searchAssets listing
+        per collection instead; those queries run concurrently and share JSON-RPC batches.
+        """
+        collections = list(collections)
+        if len(collections) > 1:
+            assets = await self.helius.get_assets_by_owner(wallet_address, 1, OWNER_PAGE_LIMIT)
+            if len(assets) < OWNER_PAGE_LIMIT:
+                return count_by_collection(assets, set(collections))
+        counts = await asyncio.gather(*(self._count_owned(wallet_address, coll_addr) for coll_addr in collections))
+        return {coll_addr: count for coll_addr, count in zip(collections, counts) if count}
+
+    async def _lookup_wallet_holdings(self, wallet_address: str, collections) -> dict:
+        """
+        _fetch_wallet_holdings() through the wallet lookup cache.
+        """
+        collections = list(collections)
+        counts = await asyncio.gather(*(
+            self.wallet_lookups.get((wallet_address, coll_addr), lambda coll_addr=coll_addr: self._count_owned(wallet_address, coll_addr))
+            for coll_addr in collections
+        ))
+        return {coll_addr: count for coll_addr, count in zip(collections, counts) if count}
+
+    async def get_wallet_holdings(self, wallet_address: str, collections) -> dict:
+        """
+        Holdings of one wallet in the given collections. Collections whose last crawl is newer
+        than HOLDINGS_CACHE_TTL are answered from the global snapshot; only stale ones hit Helius,
+        and those answers are reused for WALLET_LOOKUP_CACHE_TTL.
+        Returns: {collection_address: count}
+        """
+        now = time.time()
+        cached = self.holdings.get(wallet_address, {})
+        holdings = {}
+        stale = []
+        for coll_addr in collections:
+            if now - self.holdings_updated_at.get(coll_addr, 0) <= HOLDINGS_CACHE_TTL:
+                if coll_addr in cached:
+                    holdings[coll_addr] = cached[coll_addr]
+            else:
+                stale.append(coll_addr)
+
+        if stale:
+            try:
+                holdings.update(await self._lookup_wallet_holdings(wallet_address, stale))
+            except HeliusError as e:
+                # Better an older answer than none: fall back to whatever the snapshot has.
+                logger.warning(f"Live holdings lookup for {wallet_address} failed, using snapshot: {e}")
+                holdings.update({coll_addr: cached[coll_addr] for coll_addr in stale if coll_addr in cached})
+        return holdings
+
+    async def refresh_wallet_holdings(self, wallets) -> dict:
+        """
+        Re-queries only the given wallets and patches them into the cached global snapshot.
+        Returns: {wallet: {collection_address: count}} for the refreshed wallets.
+        """
+        wallets = list(wallets)
+        tracked = {row[0] for row in await self.db.get_all_collections()}
+        results = await asyncio.gather(
+            *(self._fetch_wallet_holdings(wallet, tracked) for wallet in wallets),
+            return_exceptions=True
+        )
+
+        updated = {}
+        for wallet, result in zip(wallets, results):
+            if isinstance(result, Exception):
+                # Leave the wallet's cached holdings alone rather than wiping them.
+                logger.warning(f"Could not refresh holdings for {wallet}: {result}")
+                continue
+            updated[wallet] = result
+
+        await self.db.replace_wallet_holdings(updated, time.time())
+        for wallet, colls in updated.items():
+            for coll_addr in tracked:
+                self.wallet_lookups.put((wallet, coll_addr), colls.get(coll_addr, 0))
+            if colls:
+                self.holdings[wallet] = colls
+            else:
+                self.holdings.pop(wallet, None)
+
+        logger.info(f"Refreshed holdings for {len(updated)} wallet(s)")
+        return updated
+
     async def calculate_roles(self, wallet_address: Optional[str]) -> Tuple[Set[int], Set[int]]:
         """
         Calculates which roles should be added and removed for a specific wallet.
         Used for instant verification / !test command.
         """
-        collections = await self.db.get_all_collections()
-        if not collections:
+        tier_table = await self.get_tier_table()
+        if not tier_table.collections:
             return set(), set()
-        
+
         if wallet_address:
-            assets = await self.helius.get_all_assets_by_owner(wallet_address)
+            holdings = await self.get_wallet_holdings(wallet_address, tier_table.collections)
         else:
-            assets = []
-        
-        holdings = {}
-        for asset in assets:
-            grouping = asset.get("grouping", [])
-            for group in grouping:
-                if group.get("group_key") == "collection":
-                    addr = group.get("group_value")
-                    holdings[addr] = holdings.get(addr, 0) + 1
-        
-        return await self.calculate_roles_from_holdings(holdings, collections)
+            holdings = {}
 
-    async def calculate_roles_from_holdings(self, user_holdings: dict, all_collections: list) -> Tuple[Set[int], Set[int]]:
+        return self.calculate_roles_from_holdings(holdings, tier_table)
+
+    def calculate_roles_from_holdings(self, user_holdings: dict, tier_table: TierTable) -> Tuple[Set[int], Set[int]]:
         """
-        Core logic to match holdings against tiers.
+        Core logic to match holdings against tiers. Pure CPU, no database access.
         user_holdings: {collection_address: count}
-        all_collections: list of collection rows from DB
+        tier_table: compiled table from get_tier_table()
         """
-        roles_to_add = set()
-        roles_to_keep = set()
-        all_managed_roles = set()
-
-        for coll_row in all_collections:
-            coll_addr = coll_row[0]
-            tiers = await self.db.get_tiers(coll_addr)
-            
-            user_count = user_holdings.get(coll_addr, 0)
-            
-            found_highest = False
-            for tier in tiers:
-                min_amount = tier[2]
-                role_id = tier[3]
-                all_managed_roles.add(role_id)
-                
-                if not found_highest and user_count >= min_amount:
-                    roles_to_add.add(role_id)
-                    roles_to_keep.add(role_id)
-                    found_highest = True
-                
-        roles_to_remove = all_managed_roles - roles_to_keep
-        return roles_to_add, roles_to_remove
+        return tier_table.roles_for(user_holdings)
+
+    def calculate_bulk_roles(self, holdings: Mapping[str, dict], tier_table: TierTable) -> Dict[str, FrozenSet[int]]:
+        """
+        Desired managed roles for many wallets at once. Pure CPU, no database access.
+        holdings: {wallet: {collection_address: count}}
+        Returns: {wallet: frozenset(role_ids)}
+        """
+        return tier_table.bulk_roles(holdings)
@@ -0,0 +1,159 @@
+import asyncio
+import discord
+import logging
+import time
+from collections import deque
+from typing import Dict, Set, Tuple
+from .config import ROLE_MUTATION_CONCURRENCY
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+async def apply_role_changes(member: discord.Member, roles_to_add_ids: Set[int], roles_to_remove_ids: Set[int]) -> bool:
+    """
+    Applies adds and removes with a single member.edit() call.
+    Returns True if Discord was called.
+    """
+    current_role_ids = {r.id for r in member.roles if not r.is_default()}
+    target_ids = (current_role_ids | set(roles_to_add_ids)) - set(roles_to_remove_ids)
+    if target_ids == current_role_ids:
+        return False
+
+    roles = []
+    for rid in target_ids:
+        role = member.guild.get_role(rid)
+        if role:
+            roles.append(role)
+
+    if {r.id for r in roles} == current_role_ids:
+        return False
+
+    await member.edit(roles=roles, reason="Open Solana Verification")
+    return True
+
+class RoleMutationScheduler:
+    """
+    Background queue for Discord role updates.
+    Repeated submissions for the same member collapse into the latest one, and each guild
+    is drained by a bounded number of workers so large resyncs stay inside Discord's
+    per-guild member-edit bucket (discord.py waits out the bucket itself; we also back
+    off on any 429 that escapes it).
+    """
+    def __init__(self, per_guild_concurrency: int = ROLE_MUTATION_CONCURRENCY):
+        self.per_guild_concurrency = max(1, per_guild_concurrency)
+        self._pending: Dict[Tuple[int, int], Tuple[discord.Member, Set[int], Set[int]]] = {}
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, list] = {}
+        self._applied_at = deque(maxlen=10000)
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.skipped = 0
+        self.failed = 0
+        metrics.ROLE_QUEUE_DEPTH.set_function(lambda: self.queue_depth)
+        metrics.ROLE_DRAIN_RATE.set_function(self.drain_rate)
+
+    def submit(self, member: discord.Member, roles_to_add_ids: Set[int], roles_to_remove_ids: Set[int]):
+        key = (member.guild.id, member.id)
+        self.submitted += 1
+
+        if key in self._pending:
+            # Already queued: the newer desired state simply replaces the old one.
+            self.coalesced += 1
+            self._pending[key] = (member, roles_to_add_ids, roles_to_remove_ids)
+            return
+
+        self._pending[key] = (member, roles_to_add_ids, roles_to_remove_ids)
+        self._queue_for(member.guild.id).put_nowait(key)
+
+    def _queue_for(self, guild_id: int) -> asyncio.Queue:
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = asyncio.Queue()
+            self._workers[guild_id] = [
+                asyncio.create_task(self._worker(queue)) for _ in range(self.per_guild_concurrency)
+            ]
+        return queue
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            key = await queue.get()
+            try:
+                job = self._pending.pop(key, None)
+                if job is not None:
+                    await self._apply(key, job)
+            finally:
+                queue.task_done()
+
+    async def _apply(self, key, job):
+        member, roles_to_add_ids, roles_to_remove_ids = job
+        start = time.perf_counter()
+        try:
+            if await apply_role_changes(member, roles_to_add_ids, roles_to_remove_ids):
+                self.applied += 1
+                self._applied_at.append(time.monotonic())
+                metrics.ROLE_EDIT_SECONDS.observe(time.perf_counter() - start)
+                metrics.ROLE_EDITS.inc(outcome="applied")
+            else:
+                self.skipped += 1
+                metrics.ROLE_EDITS.inc(outcome="skipped")
+        except discord.HTTPException as e:
+            if e.status == 429:
+                metrics.ROLE_EDITS.inc(outcome="rate_limited")
+                retry_after = getattr(e.response, "headers", {}).get("Retry-After")
+                delay = float(retry_after) if retry_after else 1.0
+                logger.warning(f"Rate limited updating roles for {member.id}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                if key not in self._pending:
+                    self._pending[key] = job
+                    self._queues[key[0]].put_nowait(key)
+            else:
+                self.failed += 1
+                metrics.ROLE_EDITS.inc(outcome="failed")
+                logger.error(f"Failed to update roles for {member.id}: {e}")
+        except Exception as e:
+            self.failed += 1
+            metrics.ROLE_EDITS.inc(outcome="failed")
+            logger.error(f"Failed to update roles for {member.id}: {e}")
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def drain_rate(self, window: float = 60.0) -> float:
+        """
+        Role edits applied per second over the last `window` seconds.
+        """
+        cutoff = time.monotonic() - window
+        while self._applied_at and self._applied_at[0] < cutoff:
+            self._applied_at.popleft()
+        return len(self._applied_at) / window
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "drain_rate": self.drain_rate(),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "applied": self.applied,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+    async def join(self):
+        """
+        Waits until every queued mutation has been processed.
+        """
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    async def close(self):
+        for workers in self._workers.values():
+            for task in workers:
+                task.cancel()
+        for workers in self._workers.values():
+            await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self._pending.clear()
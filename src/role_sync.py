@@ -0,0 +1,336 @@
+import asyncio
+import discord
+import logging
+import time
+from typing import Dict, FrozenSet, Iterable, Optional
+from .config import SYNC_FULL_RESYNC_SECONDS
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Discord accepts at most 100 user ids per gateway member request.
+MEMBER_QUERY_CHUNK = 100
+
+# Cached members scanned between yields to the event loop when collecting managed-role holders.
+MEMBER_SCAN_BATCH = 5000
+
+NO_ROLES = frozenset()
+
+async def resolve_members(guild, member_ids: Iterable[int]) -> Dict[int, discord.Member]:
+    """
+    Looks members up in the cache and requests the rest over the gateway in chunks,
+    caching them (members are not chunked at startup). Ids not in the guild are left out.
+    Returns: {member_id: member}
+    """
+    members = {}
+    missing = []
+    for member_id in member_ids:
+        member = guild.get_member(member_id)
+        if member is not None:
+            members[member_id] = member
+        else:
+            missing.append(member_id)
+
+    if guild.chunked:
+        return members  # every member is cached, so the rest are not in the guild
+
+    for i in range(0, len(missing), MEMBER_QUERY_CHUNK):
+        chunk = missing[i:i + MEMBER_QUERY_CHUNK]
+        try:
+            found = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            logger.warning(f"Could not fetch {len(chunk)} member(s) of guild {guild.id}: {e}")
+            continue
+        members.update((member.id, member) for member in found)
+    return members
+
+class RoleSyncer:
+    """
+    Collection-based role sync. Remembers what the previous pass saw, so the next pass
+    only touches what changed.
+    `bot` needs `guilds`, `db`, `role_engine` and `role_scheduler`; anything shaped like
+    NFTVerificationBot works (the benchmarks drive it with fake guilds).
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self.holdings = None  # {wallet: {collection: count}} evaluated by the last pass
+        self.wallet_map = {}  # {discord_id: wallet}
+        self.desired_roles = {}  # {wallet: frozenset(role_ids)}
+        self.tier_table = None
+        self.last_full_pass = 0.0  # time.monotonic() of the last full pass
+        self._masked = (None, NO_ROLES, None)  # (compiled table, collections left out, table used for the pass)
+        self._absent = {}  # guild_id -> linked ids found missing by the last full pass
+        self._chunked = set()  # guild ids whose member list this process has fetched in full
+        self._drain_watch: Optional[asyncio.Task] = None
+
+    def needs_full_pass(self, tier_table) -> bool:
+        return (
+            self.holdings is None
+            or tier_table is not self.tier_table
+            or time.monotonic() - self.last_full_pass >= SYNC_FULL_RESYNC_SECONDS
+        )
+
+    def _sync_member(self, member, desired: FrozenSet[int], tier_table) -> bool:
+        # Queue the edit; the scheduler coalesces and applies it in the background
+        try:
+            self.bot.role_scheduler.submit(member, set(desired), set(tier_table.managed_roles - desired))
+            return True
+        except Exception as e:
+            logger.error(f"Error syncing user {member.id}: {e}")
+            return False
+
+    @staticmethod
+    def _has_managed_roles(guild, tier_table) -> bool:
+        return any(guild.get_role(role_id) is not None for role_id in tier_table.managed_roles)
+
+    async def _members_for(self, guild, member_ids, tier_table) -> Dict[int, discord.Member]:
+        """
+        resolve_members() that skips ids the last full pass already found missing,
+        unless they have since (re)joined and are cached. Guilds without any managed
+        role have nothing to sync, so their members are not looked up at all.
+        """
+        if not self._has_managed_roles(guild, tier_table):
+            return {}
+        absent = self._absent.get(guild.id, ())
+        members = {}
+        wanted = []
+        for member_id in member_ids:
+            member = guild.get_member(member_id)
+            if member is not None:
+                members[member_id] = member
+            elif member_id not in absent:
+                wanted.append(member_id)
+        members.update(await resolve_members(guild, wanted))
+        return members
+
+    async def _chunk(self, guild):
+        """
+        Holders are looked up in the member cache, and members are not chunked at startup. So the
+        first full pass in a guild with managed roles fetches its member list once; that way
+        holders without a linked wallet (manual grants, links replaced or removed while the
+        bot was down) are found. The gateway keeps the cache current afterwards.
+        """
+        if guild.id in self._chunked or guild.chunked:
+            return
+        try:
+            await guild.chunk(cache=True)
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            logger.warning(f"Could not fetch the member list of guild {guild.id}; retrying on the next full pass: {e}")
+            return
+        self._chunked.add(guild.id)
+        logger.info(f"Fetched the member list of guild {guild.id} ({len(guild.members)} members)")
+
+    async def _role_holders(self, guild, managed_roles) -> Dict[int, discord.Member]:
+        """
+        Cached members holding any managed role, in one pass over the member cache (each
+        Role.members call rescans all of it). Yields every MEMBER_SCAN_BATCH members so a
+        large guild does not stall the event loop.
+        Returns: {member_id: member}
+        """
+        holders = {}
+        for scanned, member in enumerate(guild.members, 1):
+            if any(role.id in managed_roles for role in member.roles):
+                holders[member.id] = member
+            if scanned % MEMBER_SCAN_BATCH == 0:
+                await asyncio.sleep(0)
+        return holders
+
+    async def _full_pass(self, global_holdings, tier_table, wallet_map) -> int:
+        """
+        Evaluates every holder of a managed role plus every linked (or just unlinked) user.
+        Past the one-time member chunk per guild, the work set scales with verified holders,
+        not with guild size.
+        """
+        # Desired roles of every linked wallet, in one bulk evaluation
+        desired_roles = self.bot.role_engine.calculate_bulk_roles(
+            {wallet: global_holdings.get(wallet, {}) for wallet in wallet_map.values()}, tier_table
+        )
+        evaluated = 0
+        self._absent = {}
+
+        for guild in self.bot.guilds:
+            if not self._has_managed_roles(guild, tier_table):
+                continue  # no role here to add or remove
+            await self._chunk(guild)
+            members = await self._role_holders(guild, tier_table.managed_roles)
+
+            linked_ids = set(wallet_map).union(self.wallet_map).difference(members)
+            found = await resolve_members(guild, linked_ids)
+            members.update(found)
+            self._absent[guild.id] = linked_ids.difference(found)
+
+            for member in members.values():
+                wallet_address = wallet_map.get(member.id)
+                evaluated += 1
+                self._sync_member(member, desired_roles.get(wallet_address, NO_ROLES), tier_table)
+            await asyncio.sleep(0)
+
+        self.desired_roles = desired_roles
+        return evaluated
+
+    async def _incremental_pass(self, global_holdings, tier_table, wallet_map) -> int:
+        """
+        Evaluates only members whose wallet link changed or whose holdings moved into a different role set.
+        """
+        previous_holdings = self.holdings
+        previous_desired = self.desired_roles
+        wallet_owners = {wallet: discord_id for discord_id, wallet in wallet_map.items()}
+
+        affected_ids = {
+            discord_id for discord_id, wallet in wallet_map.items()
+            if self.wallet_map.get(discord_id) != wallet
+        }
+        affected_ids.update(discord_id for discord_id in self.wallet_map if discord_id not in wallet_map)
+
+        changed = [wallet for wallet in wallet_owners if previous_holdings.get(wallet) != global_holdings.get(wallet)]
+        relinked = {wallet_map[discord_id] for discord_id in affected_ids if discord_id in wallet_map}
+        desired_roles = self.bot.role_engine.calculate_bulk_roles(
+            {wallet: global_holdings.get(wallet, {}) for wallet in relinked.union(changed)}, tier_table
+        )
+        for wallet in changed:
+            if desired_roles[wallet] != previous_desired.get(wallet):
+                affected_ids.add(wallet_owners[wallet])
+        previous_desired.update(desired_roles)
+
+        evaluated = 0
+        for guild in self.bot.guilds:
+            for discord_id, member in (await self._members_for(guild, affected_ids, tier_table)).items():
+                wallet_address = wallet_map.get(discord_id)
+                evaluated += 1
+                self._sync_member(member, desired_roles.get(wallet_address, NO_ROLES), tier_table)
+
+        return evaluated
+
+    async def run_pass(self) -> Optional[dict]:
+        """
+        One sync pass: crawl, resolve users, calculate roles and queue Discord edits.
+        Returns per-phase timings and counts, or None when the pass was skipped.
+        """
+        start = time.perf_counter()
+        try:
+            summary = await self._run_pass()
+        except Exception:
+            metrics.SYNC_PASSES.inc(outcome="error")
+            raise
+        finally:
+            metrics.SYNC_INCOMPLETE_COLLECTIONS.set(len(self.bot.role_engine.incomplete_collections))
+
+        if summary is None:
+            metrics.SYNC_PASSES.inc(outcome="skipped")
+            return None
+
+        metrics.SYNC_PASSES.inc(outcome=summary["mode"])
+        metrics.SYNC_PASS_SECONDS.observe(time.perf_counter() - start, mode=summary["mode"])
+        metrics.SYNC_MEMBERS_EVALUATED.set(summary["evaluated"])
+        metrics.SYNC_LAST_SUCCESS.set(time.time())
+        for phase, seconds in summary["timings"].items():
+            metrics.SYNC_PHASE_SECONDS.observe(seconds, phase=phase)
+        self._watch_drain()
+        return summary
+
+    def _watch_drain(self):
+        """
+        Times the discord_mutations phase: how long the queued edits take to drain.
+        """
+        if self._drain_watch is not None and not self._drain_watch.done():
+            return
+
+        async def watch(start):
+            await self.bot.role_scheduler.join()
+            metrics.SYNC_PHASE_SECONDS.observe(time.perf_counter() - start, phase="discord_mutations")
+
+        self._drain_watch = asyncio.create_task(watch(time.perf_counter()))
+
+    def _pass_tier_table(self, tier_table):
+        """
+        Never act on a collection that has no complete crawl to fall back on: its tier roles
+        are left out of the pass (neither added nor removed) until it has one. The masked
+        table is reused while the set of such collections stays the same, so it does not
+        force a full pass each time.
+        """
+        engine = self.bot.role_engine
+        unknown = frozenset(c for c in engine.incomplete_collections if not engine.has_snapshot(c))
+        base, masked, table = self._masked
+        if base is tier_table and masked == unknown:
+            return table
+
+        table = tier_table.without(unknown)
+        if unknown:
+            logger.warning(f"No complete crawl yet for {', '.join(sorted(unknown))}; leaving their roles out of role sync")
+        self._masked = (tier_table, unknown, table)
+        return table
+
+    async def _run_pass(self) -> Optional[dict]:
+        bot = self.bot
+        timings = {}
+
+        # 1. Fetch global holdings (once per sync loop)
+        start = time.perf_counter()
+        global_holdings = await bot.role_engine.get_global_holdings()
+        timings["crawl"] = time.perf_counter() - start
+
+        # 2. Compiled tiers and managed roles (cached until tiers/collections change)
+        tier_table = self._pass_tier_table(await bot.role_engine.get_tier_table())
+
+        if not tier_table.managed_roles:
+            logger.info("No managed roles found. Skipping sync.")
+            return None
+
+        # 3. Resolve every linked member -> wallet in a single query
+        start = time.perf_counter()
+        wallet_map = await bot.db.get_wallet_map()
+        timings["resolve_users"] = time.perf_counter() - start
+
+        if not bot.role_engine.last_refreshed and wallet_map == self.wallet_map and not self.needs_full_pass(tier_table):
+            logger.debug("No holdings or wallet links changed. Skipping sync.")
+            return None
+
+        # 4. Evaluate everyone on the first pass, after tier changes and periodically;
+        #    otherwise only the members whose wallet or desired roles changed.
+        start = time.perf_counter()
+        if self.needs_full_pass(tier_table):
+            mode = "full"
+            evaluated = await self._full_pass(global_holdings, tier_table, wallet_map)
+            self.last_full_pass = time.monotonic()
+        else:
+            mode = "incremental"
+            evaluated = await self._incremental_pass(global_holdings, tier_table, wallet_map)
+        timings["calculate_roles"] = time.perf_counter() - start
+        logger.info(f"{mode.capitalize()} role sync evaluated {evaluated} members.")
+
+        self.holdings = global_holdings
+        self.wallet_map = wallet_map
+        self.tier_table = tier_table
+
+        stats = bot.role_scheduler.stats()
+        logger.info(f"Role mutation queue depth {stats['queue_depth']}, draining {stats['drain_rate']:.2f}/s ({stats['applied']} applied, {stats['coalesced']} coalesced, {stats['failed']} failed)")
+
+        return {"mode": mode, "evaluated": evaluated, "wallets": len(global_holdings), "timings": timings}
+
+    async def sync_wallets(self, wallets):
+        """
+        Event-driven update from the webhook receiver: refreshes the holdings of the linked
+        wallets among these and re-evaluates their members. Escrow, fee-payer and other
+        unlinked accounts are left to the next crawl.
+        """
+        bot = self.bot
+        owners = await bot.db.get_users_by_wallets(wallets)
+        if not owners:
+            logger.debug(f"Webhook update touched no linked wallet among {len(wallets)}.")
+            return
+        await bot.role_engine.refresh_wallet_holdings(owners)
+
+        tier_table = self._pass_tier_table(await bot.role_engine.get_tier_table())
+        if not tier_table.managed_roles:
+            return
+
+        wallet_of = {discord_id: wallet for wallet, discord_id in owners.items()}
+        desired_roles = bot.role_engine.calculate_bulk_roles(
+            {wallet: bot.role_engine.holdings.get(wallet, {}) for wallet in owners}, tier_table
+        )
+        self.desired_roles.update(desired_roles)
+        for guild in bot.guilds:
+            for discord_id, member in (await self._members_for(guild, wallet_of, tier_table)).items():
+                self._sync_member(member, desired_roles[wallet_of[discord_id]], tier_table)
+
+        logger.info(f"Webhook update re-evaluated {len(owners)} linked wallet(s) of {len(wallets)} touched.")
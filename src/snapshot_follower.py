@@ -0,0 +1,84 @@
+import logging
+from .db import Database
+from .helius_client import HeliusClient
+from .role_engine import RoleEngine, TierTable
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class SnapshotFollower(RoleEngine):
+    """
+    RoleEngine for BOT_MODE=shard processes. Instead of crawling, it follows the holdings
+    snapshots the crawler process publishes to the database: each poll replays only the
+    wallets changed since the last version it applied. Per-wallet lookups (verification,
+    !test) work as usual.
+    """
+    def __init__(self, db: Database, helius: HeliusClient):
+        super().__init__(db, helius)
+        self.snapshot_version = 0
+        self._tier_rows = None
+
+    async def load_cached_holdings(self):
+        # Read the version first: changes published meanwhile are replayed on the next poll.
+        version = await self.db.get_snapshot_version()
+        await super().load_cached_holdings()
+        tracked = [row[0] for row in await self.db.get_all_collections()]
+        self.incomplete_collections = {coll_addr for coll_addr in tracked if coll_addr not in self.holdings_updated_at}
+        self.snapshot_version = version
+        metrics.SNAPSHOT_VERSION.set(version)
+
+    async def get_tier_table(self) -> TierTable:
+        """
+        Tiers can be edited from any process, so the (small) tier rows are re-read on every
+        call; the table is recompiled only when they differ.
+        """
+        rows = await self.db.get_tracked_tiers()
+        if self._tier_table is None or rows != self._tier_rows:
+            self._tier_table = TierTable.compile(rows)
+            self._tier_rows = rows
+            logger.info(
+                f"Compiled tier table: {len(self._tier_table.collections)} collections, "
+                f"{len(self._tier_table.managed_roles)} managed roles"
+            )
+        return self._tier_table
+
+    async def get_global_holdings(self) -> dict:
+        """
+        Applies snapshot versions published since the last call.
+        Returns: {wallet_address: {collection_address: count}}, a new dict whenever anything changed
+        """
+        version, changed = await self.db.get_snapshot_changes(self.snapshot_version)
+        if version == self.snapshot_version:
+            self.last_refreshed = []
+            return self.holdings
+
+        if changed is None:
+            logger.warning(f"Snapshot change log no longer reaches version {self.snapshot_version}; reloading all holdings")
+            holdings, updated_at = await self.db.load_holdings_snapshot()
+        else:
+            holdings = dict(self.holdings)
+            patch = await self.db.load_wallets_holdings(changed)
+            for wallet in changed:
+                if wallet in patch:
+                    holdings[wallet] = patch[wallet]
+                else:
+                    holdings.pop(wallet, None)
+            updated_at = await self.db.get_collection_timestamps()
+
+        tracked = [row[0] for row in await self.db.get_all_collections()]
+        refreshed = [coll_addr for coll_addr, when in updated_at.items() if self.holdings_updated_at.get(coll_addr) != when]
+        # Webhook updates patch wallets without moving any collection's timestamp.
+        if not refreshed and changed != set():
+            refreshed = list(updated_at)
+
+        self.holdings = holdings
+        self.holdings_updated_at = updated_at
+        # The crawler only publishes complete crawls; a collection it never finished has no snapshot.
+        self.incomplete_collections = {coll_addr for coll_addr in tracked if coll_addr not in updated_at}
+        self.last_refreshed = refreshed
+        self.snapshot_version = version
+        metrics.SNAPSHOT_VERSION.set(version)
+
+        detail = "full reload" if changed is None else f"{len(changed)} changed wallet(s)"
+        logger.info(f"Applied holdings snapshot v{version}: {detail}, {len(refreshed)} collection(s) refreshed")
+        return holdings
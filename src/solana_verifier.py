@@ -1,20 +1,126 @@
+import aiohttp
+import itertools
 import logging
-from solana.rpc.async_api import AsyncClient
-from solders.signature import Signature
-from .config import SOLANA_RPC_URL
+from typing import Dict, List, Optional
+from .config import SOLANA_RPC_URL, CHALLENGE_RPC_BATCH_SIZE, CHALLENGE_SIGNATURE_LIMIT
+from .rate_limiter import TokenBucket
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
+def find_self_transfer(tx: dict, expected_sender: str, expected_lamports: int) -> bool:
+    """
+    Checks a jsonParsed getTransaction result (plain JSON) for a successful self-transfer of the expected amount.
+    """
+    if not tx or (tx.get("meta") or {}).get("err") is not None:
+        return False
+
+    instructions = tx.get("transaction", {}).get("message", {}).get("instructions", [])
+    for instr in instructions:
+        parsed = instr.get("parsed")
+        if instr.get("program") != "system" or not isinstance(parsed, dict) or parsed.get("type") != "transfer":
+            continue
+        info = parsed.get("info", {})
+        if (
+            info.get("source") == expected_sender and
+            info.get("destination") == expected_sender and
+            abs(info.get("lamports", 0) - expected_lamports) < 10 # Allow tiny rounding error
+        ):
+            return True
+    return False
+
 class SolanaVerifier:
-    def __init__(self):
-        self.client = AsyncClient(SOLANA_RPC_URL)
+    """
+    On-chain checks for wallet challenges. solana-py and solders are slow to import, so they
+    are loaded, and the AsyncClient built, on the first pasted-signature verification.
+    Pass the HeliusClient's `limiter` when SOLANA_RPC_URL is the Helius endpoint, so these
+    calls share its request budget with the crawl.
+    """
+    def __init__(self, limiter: Optional[TokenBucket] = None):
+        self._client = None
+        self.url = SOLANA_RPC_URL
+        self.limiter = limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ids = itertools.count(1)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from solana.rpc.async_api import AsyncClient
+            self._client = AsyncClient(self.url)
+        return self._client
+
+    async def _rpc_batch(self, calls: List[tuple]) -> list:
+        """
+        Sends (method, params) calls as JSON-RPC batches of CHALLENGE_RPC_BATCH_SIZE.
+        Returns results in call order (None where a call failed).
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+
+        results = []
+        for i in range(0, len(calls), CHALLENGE_RPC_BATCH_SIZE):
+            chunk = calls[i:i + CHALLENGE_RPC_BATCH_SIZE]
+            ids = [next(self._ids) for _ in chunk]
+            body = [
+                {"jsonrpc": "2.0", "id": rpc_id, "method": method, "params": params}
+                for rpc_id, (method, params) in zip(ids, chunk)
+            ]
+            responses = {}
+            if self.limiter is not None:
+                await self.limiter.acquire(len(chunk))
+            try:
+                async with self._session.post(self.url, json=body) as response:
+                    if response.status != 200:
+                        logger.error(f"Solana RPC error: {response.status} - {await response.text()}")
+                    else:
+                        data = await response.json()
+                        if isinstance(data, list):
+                            responses = {item.get("id"): item for item in data if isinstance(item, dict)}
+                        else:
+                            logger.error(f"Solana RPC error: {data}")
+            except Exception as e:
+                logger.exception(f"Exception calling Solana RPC: {e}")
+
+            for rpc_id in ids:
+                item = responses.get(rpc_id) or {}
+                if "error" in item:
+                    logger.warning(f"Solana RPC call failed: {item['error']}")
+                results.append(item.get("result"))
+        return results
+
+    async def get_signatures_for_addresses(self, addresses: List[str]) -> Dict[str, Optional[list]]:
+        """
+        Recent signatures for many addresses in batched round-trips.
+        Returns: {address: [signature info] or None on error}
+        """
+        calls = [
+            ("getSignaturesForAddress", [address, {"limit": CHALLENGE_SIGNATURE_LIMIT, "commitment": "confirmed"}])
+            for address in addresses
+        ]
+        return dict(zip(addresses, await self._rpc_batch(calls)))
+
+    async def get_transactions(self, signatures: List[str]) -> Dict[str, Optional[dict]]:
+        """
+        jsonParsed transactions for many signatures in batched round-trips.
+        """
+        calls = [
+            ("getTransaction", [sig, {"encoding": "jsonParsed", "commitment": "confirmed", "maxSupportedTransactionVersion": 0}])
+            for sig in signatures
+        ]
+        return dict(zip(signatures, await self._rpc_batch(calls)))
 
     async def verify_transaction(self, signature_str: str, expected_sender: str, expected_amount: float) -> bool:
         """
         Verifies a self-transfer transaction using jsonParsed encoding.
         """
         try:
+            from solders.signature import Signature
+            from solders.transaction_status import ParsedInstruction
+
             signature = Signature.from_string(signature_str)
+            if self.limiter is not None:
+                await self.limiter.acquire()
             # Fetch transaction with jsonParsed encoding to easily read instructions
             resp = await self.client.get_transaction(
                 signature, 
@@ -24,6 +130,7 @@ class SolanaVerifier:
             
             if resp.value is None:
                 logger.warning(f"Transaction {signature_str} not found on chain.")
+                metrics.VERIFICATIONS.inc(source="signature", outcome="not_found")
                 return False
 
             # Correct hierarchy for EncodedConfirmedTransactionWithStatusMeta
@@ -33,6 +140,7 @@ class SolanaVerifier:
             # 1. Verify it is a successful transaction
             if meta.err is not None:
                 logger.warning(f"Transaction {signature_str} failed on chain: {meta.err}")
+                metrics.VERIFICATIONS.inc(source="signature", outcome="failed_on_chain")
                 return False
 
             # 2. Extract and verify instructions
@@ -44,8 +152,6 @@ class SolanaVerifier:
             found_transfer = False
             expected_lamports = int(expected_amount * 1_000_000_000)
             
-            from solders.transaction_status import ParsedInstruction
-            
             for instr in instructions:
                 # In jsonParsed, we check for ParsedInstruction
                 if isinstance(instr, ParsedInstruction):
@@ -68,14 +174,20 @@ class SolanaVerifier:
                             break
 
             if found_transfer:
+                metrics.VERIFICATIONS.inc(source="signature", outcome="verified")
                 return True
             else:
                 logger.warning("No matching self-transfer instruction found.")
+                metrics.VERIFICATIONS.inc(source="signature", outcome="no_match")
                 return False
 
         except Exception as e:
             logger.exception(f"Verification error: {e}")
+            metrics.VERIFICATIONS.inc(source="signature", outcome="error")
             return False
 
     async def close(self):
-        await self.client.close()
+        if self._client is not None:
+            await self._client.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
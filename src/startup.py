@@ -0,0 +1,49 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use (verification, bulk role evaluation) instead of at startup.
+DEFERRED_MODULES = ("solana", "solders", "numpy")
+
+class StartupTimer:
+    """
+    Times the phases of a (re)start: module imports, setup_hook, holdings warm-up, and how
+    long until the gateway is ready. Stdlib only, so main.py can import it before anything else.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # phase -> seconds
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def report(self, milestone: str = "gateway ready"):
+        """
+        Logs the phases recorded so far (once) and exports them as gauges.
+        """
+        if self.reported:
+            return
+        self.reported = True
+        total = time.perf_counter() - self.started
+        from . import metrics
+        for name, seconds in self.phases.items():
+            metrics.STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+        metrics.STARTUP_PHASE_SECONDS.set(total, phase=milestone)
+
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        loaded = [module for module in DEFERRED_MODULES if module in sys.modules]
+        logger.info(
+            f"Startup: {milestone} {total:.2f}s after launch ({phases}); "
+            f"deferred modules loaded so far: {', '.join(loaded) or 'none'}"
+        )
+
+startup = StartupTimer()
@@ -1,57 +1,58 @@
 from discord.ext import tasks, commands
 import logging
-import aiosqlite
-from .bot import bot, apply_role_changes
+from .bot import bot, complete_verification
+from .role_sync import RoleSyncer
+from .config import (
+    SYNC_INTERVAL_MINUTES, WEBHOOK_ENABLED, WEBHOOK_RECONCILE_MINUTES,
+    CHALLENGE_WATCHER_ENABLED, CHALLENGE_POLL_SECONDS,
+    BOT_MODE, SHARD_IDS, SNAPSHOT_POLL_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
-@tasks.loop(minutes=5)
+syncer = RoleSyncer(bot)
+
+@tasks.loop(minutes=SYNC_INTERVAL_MINUTES)
 async def sync_roles_task():
     logger.info("Starting background role sync (collection-based)...")
-    
+
     try:
-        # 1. Fetch global holdings (once per sync loop)
-        global_holdings = await bot.role_engine.get_global_holdings()
-        
-        # 2. Fetch all collections and managed roles
-        all_collections = await bot.db.get_all_collections()
-        async with aiosqlite.connect(bot.db.db_path) as db:
-            async with db.execute("SELECT DISTINCT role_id FROM tiers") as cursor:
-                rows = await cursor.fetchall()
-                managed_role_ids = {row[0] for row in rows}
-        
-        if not managed_role_ids:
-            logger.info("No managed roles found. Skipping sync.")
-            return
-
-        # 3. Iterate through all members and sync based on global holdings
-        for guild in bot.guilds:
-            for member in guild.members:
-                # Check if member has managed roles or is in our linked users
-                has_managed_role = any(r.id in managed_role_ids for r in member.roles)
-                user_record = await bot.db.get_user(member.id)
-                
-                if has_managed_role or user_record:
-                    wallet_address = user_record[1] if user_record else None
-                    
-                    # Get this specific user's holdings from our global map
-                    user_holdings = global_holdings.get(wallet_address, {}) if wallet_address else {}
-                    
-                    # Calculate and apply
-                    try:
-                        to_add, to_remove = await bot.role_engine.calculate_roles_from_holdings(user_holdings, all_collections)
-                        await apply_role_changes(member, to_add, to_remove)
-                    except Exception as e:
-                        logger.error(f"Error syncing user {member.id}: {e}")
-                        
+        await syncer.run_pass()
     except Exception as e:
         logger.error(f"Global sync task error: {e}")
-                    
+
     logger.info("Background role sync completed.")
 
 @sync_roles_task.before_loop
 async def before_sync_roles_task():
     await bot.wait_until_ready()
+    # A pass before the cached snapshot is loaded would start from empty holdings.
+    await bot.holdings_loaded.wait()
+
+@tasks.loop(seconds=CHALLENGE_POLL_SECONDS)
+async def watch_challenges_task():
+    try:
+        for discord_id, wallet, signature in await bot.challenge_watcher.poll():
+            try:
+                await complete_verification(discord_id, wallet)
+            except Exception as e:
+                logger.error(f"Error completing verification for {discord_id}: {e}")
+    except Exception as e:
+        logger.error(f"Challenge watcher error: {e}")
+
+@watch_challenges_task.before_loop
+async def before_watch_challenges_task():
+    await bot.wait_until_ready()
 
 def start_background_tasks():
+    if BOT_MODE == "shard":
+        # The crawler process owns crawling and webhooks; shards just follow its snapshots.
+        sync_roles_task.change_interval(seconds=SNAPSHOT_POLL_SECONDS)
+    elif WEBHOOK_ENABLED:
+        # Webhooks keep holdings current; the full crawl only reconciles missed events.
+        bot.webhook_server.on_wallets_changed = syncer.sync_wallets
+        sync_roles_task.change_interval(minutes=WEBHOOK_RECONCILE_MINUTES)
     sync_roles_task.start()
+    # Pending challenges are shared by every process; one shard group watching them is enough.
+    if CHALLENGE_WATCHER_ENABLED and (not SHARD_IDS or 0 in SHARD_IDS):
+        watch_challenges_task.start()
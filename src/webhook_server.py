@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Set
+from aiohttp import web
+from .config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_AUTH_TOKEN, WEBHOOK_DEBOUNCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def extract_wallets(payload) -> Set[str]:
+    """
+    Collects every wallet touched by Helius enhanced-transaction webhook events:
+    token transfers, NFT sale events and compressed NFT transfers.
+    """
+    transactions = payload if isinstance(payload, list) else [payload]
+    wallets = set()
+
+    for tx in transactions:
+        if not isinstance(tx, dict):
+            continue
+
+        for transfer in tx.get("tokenTransfers") or []:
+            wallets.add(transfer.get("fromUserAccount"))
+            wallets.add(transfer.get("toUserAccount"))
+
+        events = tx.get("events") or {}
+        nft_event = events.get("nft") or {}
+        wallets.add(nft_event.get("buyer"))
+        wallets.add(nft_event.get("seller"))
+
+        for event in events.get("compressed") or []:
+            wallets.add(event.get("oldLeafOwner"))
+            wallets.add(event.get("newLeafOwner"))
+
+    wallets.discard(None)
+    wallets.discard("")
+    return wallets
+
+class HeliusWebhookServer:
+    """
+    Embedded HTTP endpoint for Helius NFT transfer webhooks.
+    Requests are acknowledged immediately; touched wallets are collected and handed to
+    `on_wallets_changed` in debounced batches so a burst of sales costs one refresh.
+    """
+    def __init__(self, on_wallets_changed: Optional[Callable[[Set[str]], Awaitable[None]]] = None):
+        self.on_wallets_changed = on_wallets_changed
+        self._pending: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self._processor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        self._processor = asyncio.create_task(self._process())
+        logger.info(f"Helius webhook receiver listening on http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    async def close(self):
+        if self._processor is not None:
+            self._processor.cancel()
+            await asyncio.gather(self._processor, return_exceptions=True)
+            self._processor = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if WEBHOOK_AUTH_TOKEN and request.headers.get("Authorization") != WEBHOOK_AUTH_TOKEN:
+            return web.Response(status=401)
+
+        try:
+            payload = await request.json()
+        except Exception:
+            return web.Response(status=400, text="invalid JSON")
+
+        wallets = extract_wallets(payload)
+        if wallets:
+            self._pending.update(wallets)
+            self._wakeup.set()
+        return web.json_response({"wallets": len(wallets)})
+
+    async def _process(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(WEBHOOK_DEBOUNCE_SECONDS)
+            self._wakeup.clear()
+
+            wallets, self._pending = self._pending, set()
+            if not wallets or self.on_wallets_changed is None:
+                continue
+
+            try:
+                await self.on_wallets_changed(wallets)
+            except Exception as e:
+                logger.exception(f"Webhook wallet update failed: {e}")
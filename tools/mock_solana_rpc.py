@@ -0,0 +1,150 @@
+"""
+Local stand-in for a Solana JSON-RPC node, for exercising the challenge watcher.
+
+Serves getSignaturesForAddress and getTransaction (jsonParsed), single or batched.
+Transfers are injected over HTTP:
+
+    POST /inject {"source": "<wallet>", "destination": "<wallet>", "lamports": 1234, "err": null}
+
+Usage:
+    python -m tools.mock_solana_rpc [--port 8899]    # then SOLANA_RPC_URL=http://127.0.0.1:8899
+    python -m tools.mock_solana_rpc --selftest       # runs ChallengeWatcher against the mock
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import tempfile
+import time
+
+from aiohttp import web
+
+
+class MockSolanaRPC:
+    def __init__(self):
+        self.transactions = {}  # signature -> getTransaction result
+        self.by_address = {}  # address -> [signature info], newest first
+        self.calls = 0
+        self.http_requests = 0
+
+    def inject_transfer(self, source: str, destination: str, lamports: int, err=None, block_time: int = None) -> str:
+        signature = secrets.token_hex(44)
+        block_time = int(time.time()) if block_time is None else block_time
+        self.transactions[signature] = {
+            "slot": 1,
+            "blockTime": block_time,
+            "meta": {"err": err, "fee": 5000},
+            "transaction": {
+                "signatures": [signature],
+                "message": {
+                    "instructions": [{
+                        "program": "system",
+                        "programId": "11111111111111111111111111111111",
+                        "parsed": {
+                            "type": "transfer",
+                            "info": {"source": source, "destination": destination, "lamports": lamports},
+                        },
+                    }],
+                },
+            },
+        }
+        info = {"signature": signature, "slot": 1, "err": err, "memo": None, "blockTime": block_time, "confirmationStatus": "confirmed"}
+        for address in {source, destination}:
+            self.by_address.setdefault(address, []).insert(0, info)
+        return signature
+
+    def _dispatch(self, call: dict) -> dict:
+        self.calls += 1
+        method, params = call.get("method"), call.get("params") or []
+        if method == "getSignaturesForAddress":
+            limit = (params[1] if len(params) > 1 else {}).get("limit", 1000)
+            result = self.by_address.get(params[0], [])[:limit]
+        elif method == "getTransaction":
+            result = self.transactions.get(params[0])
+        else:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        body = await request.json()
+        if isinstance(body, list):
+            return web.json_response([self._dispatch(call) for call in body])
+        return web.json_response(self._dispatch(body))
+
+    async def handle_inject(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        signature = self.inject_transfer(
+            body["source"], body.get("destination", body["source"]), int(body["lamports"]), body.get("err")
+        )
+        return web.json_response({"signature": signature})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_post("/inject", self.handle_inject)
+        return app
+
+
+async def _start(mock: MockSolanaRPC, port: int) -> web.AppRunner:
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def selftest(port: int):
+    from src.challenge_manager import ChallengeManager
+    from src.challenge_watcher import ChallengeWatcher
+    from src.config import VERIFICATION_EXPIRY_SECONDS
+    from src.db import Database
+    from src.solana_verifier import SolanaVerifier
+
+    mock = MockSolanaRPC()
+    runner = await _start(mock, port)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database()
+        db.db_path = os.path.join(tmp, "selftest.db")
+        await db.connect()
+        await db.init_db()
+
+        verifier = SolanaVerifier()
+        verifier.url = f"http://127.0.0.1:{port}/"
+        challenges = ChallengeManager(db, shared=False)
+        watcher = ChallengeWatcher(challenges, verifier)
+
+        expires_at = time.time() + VERIFICATION_EXPIRY_SECONDS
+        await challenges.create(1, "WalletA", 0.000042, expires_at)
+        await challenges.create(2, "WalletB", 0.000017, expires_at)
+
+        mock.inject_transfer("WalletA", "WalletA", 42_000)  # matches user 1
+        mock.inject_transfer("WalletB", "WalletB", 99_000)  # wrong amount
+        mock.inject_transfer("WalletB", "WalletB", 17_000, block_time=int(time.time()) - 3600)  # too old
+
+        completed = await watcher.poll()
+        print(f"completed: {[(discord_id, wallet) for discord_id, wallet, _ in completed]}")
+        print(f"rpc calls: {mock.calls} in {mock.http_requests} HTTP request(s)")
+
+        again = await watcher.poll()
+        print(f"second poll completed: {len(again)}, rpc calls: {mock.calls} in {mock.http_requests} HTTP request(s)")
+
+        await verifier.close()
+        await db.close()
+    await runner.cleanup()
+
+
+async def serve(port: int):
+    await _start(MockSolanaRPC(), port)
+    print(f"Mock Solana RPC listening on http://127.0.0.1:{port}/")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args()
+    try:
+        asyncio.run(selftest(args.port) if args.selftest else serve(args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,71 @@
+"""
+Posts synthetic Helius enhanced-transaction webhook events to a running bot.
+
+Usage:
+    python -m tools.simulate_webhook --from <wallet> --to <wallet> [--mint <mint>] [--count 1]
+        [--url http://127.0.0.1:8080/helius-webhook] [--auth <token>] [--compressed]
+"""
+import argparse
+import asyncio
+import secrets
+import time
+
+import aiohttp
+
+from src.config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_AUTH_TOKEN
+
+
+def transfer_event(source: str, destination: str, mint: str, compressed: bool = False) -> dict:
+    """
+    Builds one transfer in the shape Helius sends for enhanced webhooks.
+    """
+    event = {
+        "signature": secrets.token_hex(32),
+        "timestamp": int(time.time()),
+        "type": "TRANSFER",
+        "source": "SYSTEM_PROGRAM",
+        "tokenTransfers": [],
+        "events": {},
+    }
+    if compressed:
+        event["type"] = "COMPRESSED_NFT_TRANSFER"
+        event["events"]["compressed"] = [{
+            "type": "COMPRESSED_NFT_TRANSFER",
+            "assetId": mint,
+            "oldLeafOwner": source,
+            "newLeafOwner": destination,
+        }]
+    else:
+        event["tokenTransfers"].append({
+            "fromUserAccount": source,
+            "toUserAccount": destination,
+            "mint": mint,
+            "tokenAmount": 1,
+            "tokenStandard": "NonFungible",
+        })
+    return event
+
+
+async def main(args):
+    url = args.url or f"http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    headers = {"Authorization": args.auth} if args.auth else {}
+    payload = [
+        transfer_event(args.source, args.destination, args.mint or secrets.token_hex(16), args.compressed)
+        for _ in range(args.count)
+    ]
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=payload, headers=headers) as response:
+            print(f"{response.status} {await response.text()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", required=True)
+    parser.add_argument("--to", dest="destination", required=True)
+    parser.add_argument("--mint")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--url")
+    parser.add_argument("--auth", default=WEBHOOK_AUTH_TOKEN)
+    parser.add_argument("--compressed", action="store_true")
+    asyncio.run(main(parser.parse_args()))